@@ -9,79 +9,134 @@ import time
 import os
 import subprocess
 import logging
+from itertools import chain, islice
 from timeit import default_timer as timer
 import argparse
 
-import numpy as np
 import pandas as pd
 from joblib import Parallel, delayed
 
-from rev_parser import parse_xml, xml_generator
+import rev_parser
+from rev_parser import parse_batch, revision_generator, init_lang_cache, init_lang_subset
+from dump_reader import open_dump
+from data_io import extensions, FrameWriter
 from utils import data_dtypes
 
 ########## CONFIG ###########
 
 parser = argparse.ArgumentParser(description='WSDM Cup XML parser')
 parser.add_argument('-dir', action = "store", dest = "dir", help = 'working directory', required = True)
-
-base_path = os.path.abspath(parser.parse_args().dir)
-
-file_path = os.path.join(base_path, "raw")
-target_path = os.path.join(base_path, "proc_data")
+parser.add_argument('-n_jobs', action = "store", dest = "n_jobs", type = int, default = -1, help = 'number of workers, -1 for all cores')
+parser.add_argument('-backend', action = "store", dest = "backend", default = "threading",
+                    choices = ["threading", "multiprocessing"], help = 'joblib backend used for feature extraction')
+parser.add_argument('-batch', action = "store", dest = "batch", type = int, default = 2000, help = 'revisions per work unit')
+parser.add_argument('-chunk', action = "store", dest = "chunk", type = int, default = 200000, help = 'revisions written to the output file at a time')
+parser.add_argument('-stream', action = "store_true", dest = "stream", help = 'decompress through a pipe instead of extracting to disk')
+parser.add_argument('-format', action = "store", dest = "format", default = "csv", choices = ["csv", "parquet"], help = 'format of the proc_data files')
+parser.add_argument('-lang_cache', action = "store", dest = "lang_cache", help = 'json file to load and save the langid cache, none to not persist it')
+parser.add_argument('-lang_cache_size', action = "store", dest = "lang_cache_size", type = int, default = 2 ** 16, help = 'max tails in the langid cache, 0 to disable it')
+parser.add_argument('-lang_candidates', action = "store", dest = "lang_candidates", default = "",
+                    help = 'comma separated languages langid is restricted to, besides the claimed one, empty for all')
 
 ########## SCRIPT ###########
 
-try:
-    logging.basicConfig(filename=os.path.join(base_path, "parse_xml.log"),
-                        level=logging.DEBUG, format='%(asctime)s -- %(message)s',
-                        datefmt='%m/%d/%Y %H:%M:%S')
-    logging.info("***** Starting XML parser *****")
+def batches(iterable, size):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
 
-    if not os.path.exists(file_path):
-        raise Exception("Directory for raw xml data does not exists")
 
-    if not os.path.exists(target_path):
-        os.makedirs(target_path)
+if __name__ == "__main__":
 
-    with Parallel(n_jobs=-1, backend="threading", verbose=1) as parallel:
+    args = parser.parse_args()
+    base_path = os.path.abspath(args.dir)
 
-        del_func = delayed(parse_xml)
+    file_path = os.path.join(base_path, "raw")
+    target_path = os.path.join(base_path, "proc_data")
+    columns = sorted(data_dtypes)
 
-        files = sorted([f for f in os.listdir(file_path) if f.endswith(".xml.7z")])
-        logging.info("Will process files: \n" + ",\n".join(files))
-        for zip_file in files:
+    try:
+        logging.basicConfig(filename=os.path.join(base_path, "parse_xml.log"),
+                            level=logging.DEBUG, format='%(asctime)s -- %(message)s',
+                            datefmt='%m/%d/%Y %H:%M:%S')
+        logging.info("***** Starting XML parser *****")
+        logging.info("backend: {0}, n_jobs: {1}, batch: {2}, chunk: {3}".format(args.backend, args.n_jobs, args.batch, args.chunk))
 
-            file_name = zip_file.strip(".7z")
-            target_file = os.path.join(target_path, file_name).strip(".xml") + ".bz2"
-            logging.info("*" * 10)
+        if not os.path.exists(file_path):
+            raise Exception("Directory for raw xml data does not exists")
 
-            if os.path.exists(target_file):
-                logging.info("skipping " + zip_file)
-                logging.info("*" * 10)
-            else:
-                logging.info("doing " + zip_file)
-                logging.info("*" * 10)
+        if not os.path.exists(target_path):
+            os.makedirs(target_path)
 
-                start = timer()
+        # the production client must score languages like the training data
+        lang_candidates = [l.strip() for l in args.lang_candidates.split(",") if l.strip()] or None
+        candidates_file = os.path.join(base_path, "lang_candidates.csv")
+        init_lang_subset(lang_candidates)
+        if lang_candidates:
+            with open(candidates_file, "w") as f:
+                f.write(",".join(lang_candidates))
+        elif os.path.exists(candidates_file):
+            os.remove(candidates_file)
+        logging.info("langid candidates: {0}".format(lang_candidates or "all"))
 
-                if file_name not in os.listdir(file_path):
-                    print(subprocess.check_output(["7za", "e", "-o" + file_path, os.path.join(file_path, zip_file)]).decode("utf-8"))
+        lang_cache_file = os.path.abspath(args.lang_cache) if args.lang_cache else None
+        init_lang_cache(args.lang_cache_size, lang_cache_file)
 
-                revisions = pd.DataFrame.from_dict(parallel(del_func(rev) for rev in xml_generator( os.path.join(file_path, file_name))))
+        with Parallel(n_jobs=args.n_jobs, backend=args.backend, verbose=1) as parallel:
 
-                for col in data_dtypes:
-                    if col not in revisions:
-                        revisions[col] = np.nan
+            del_func = delayed(parse_batch)
 
-                time.sleep(5)
-                revisions.to_csv(target_file, index=False, float_format='%.4g', compression="bz2", encoding="utf-8")
+            files = sorted([f for f in os.listdir(file_path) if f.endswith(".xml.7z")])
+            logging.info("Will process files: \n" + ",\n".join(files))
+            for zip_file in files:
 
-                os.remove(os.path.join(file_path, file_name))
+                file_name = zip_file.strip(".7z")
+                target_file = os.path.join(target_path, file_name).strip(".xml") + extensions[args.format]
+                logging.info("*" * 10)
 
-                j = len(revisions)
-                enlapsed = timer() - start
-                logging.info("done {0} revision for file {1} in {2:.1f} minutes, projected: {3:.2f} hours".format(j, zip_file, enlapsed / 60, enlapsed / j * 72500000 / 60 / 60))
-except Exception as e:
-    logging.exception("***** An error ocurred *****")
-finally:
-    logging.info("***** Finished *****")
\ No newline at end of file
+                if os.path.exists(target_file):
+                    logging.info("skipping " + zip_file)
+                    logging.info("*" * 10)
+                else:
+                    logging.info("doing " + zip_file)
+                    logging.info("*" * 10)
+
+                    start = timer()
+
+                    if file_name in os.listdir(file_path):
+                        dump_file = os.path.join(file_path, file_name)
+                    elif args.stream:
+                        dump_file = os.path.join(file_path, zip_file)
+                    else:
+                        print(subprocess.check_output(["7za", "e", "-o" + file_path, os.path.join(file_path, zip_file)]).decode("utf-8"))
+                        dump_file = os.path.join(file_path, file_name)
+
+                    j = 0
+                    with open_dump(dump_file) as f, FrameWriter(target_file + ".tmp", args.format, columns, data_dtypes) as writer:
+                        for chunk in batches(revision_generator(f), args.chunk):
+                            revisions = pd.DataFrame.from_dict(list(chain.from_iterable(parallel(del_func(batch, args.lang_cache_size, lang_cache_file, lang_candidates) for batch in batches(chunk, args.batch)))))
+                            writer.write(revisions)
+                            j += len(revisions)
+                            logging.info("written {0} revisions".format(j))
+                            del revisions, chunk
+
+                    os.replace(target_file + ".tmp", target_file)
+
+                    if not args.stream:
+                        time.sleep(5)
+                        os.remove(os.path.join(file_path, file_name))
+
+                    # workers of the multiprocessing backend keep their own caches
+                    if args.backend == "threading":
+                        logging.info("langid cache: {0}".format(rev_parser.lang_cache.stats()))
+                        if lang_cache_file:
+                            rev_parser.lang_cache.save(lang_cache_file)
+
+                    enlapsed = timer() - start
+                    logging.info("done {0} revision for file {1} in {2:.1f} minutes, projected: {3:.2f} hours".format(j, zip_file, enlapsed / 60, enlapsed / j * 72500000 / 60 / 60))
+    except Exception as e:
+        logging.exception("***** An error ocurred *****")
+    finally:
+        logging.info("***** Finished *****")
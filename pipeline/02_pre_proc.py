@@ -10,91 +10,115 @@ import os
 import logging
 from timeit import default_timer as timer
 import argparse
+from functools import partial
 
 import numpy as np
 import pandas as pd
-from dask import dataframe as dd
 
 from classifier import Classifier
 from utils import data_dtypes, meta_dtypes
+from data_io import extensions, data_files, read_frame, iter_frames, write_frame
+from mappings import scan
 
 ########## CONFIG ###########
 
 parser = argparse.ArgumentParser(description='WSDM Cup XML parser')
 parser.add_argument('-dir', action = "store", dest = "dir", help = 'working directory', required = True)
-
-base_path = os.path.abspath(parser.parse_args().dir)
-
-meta_path = os.path.join(base_path, "meta")
-proc_path = os.path.join(base_path, "proc_data")
-target_path = os.path.join(base_path, "encoded_data")
-production_path = os.path.join(base_path, "production")
+parser.add_argument('-format', action = "store", dest = "format", default = "csv", choices = ["csv", "parquet"], help = 'format of the proc_data and encoded_data files')
+parser.add_argument('-n_jobs', action = "store", dest = "n_jobs", type = int, default = -1, help = 'files scanned in parallel for the mappings, -1 for all cores')
+parser.add_argument('-chunk', action = "store", dest = "chunk", type = int, default = 1000000, help = 'rows read at a time when scanning for the mappings')
+parser.add_argument('-counters', action = "store", dest = "counters", default = "exact", choices = ["exact", "sketch"], help = 'exact itemid and userid counts, or count-min sketches of them')
+parser.add_argument('-eps', action = "store", dest = "eps", type = float, default = 1e-5, help = 'sketch error, as a fraction of the total count')
+parser.add_argument('-delta', action = "store", dest = "delta", type = float, default = 0.01, help = 'probability of a sketch count above the error')
 
 ########## SCRIPT ###########
 
-try:
-    logging.basicConfig(filename=os.path.join(base_path, "pre_proc.log"),
-                        level=logging.DEBUG, format='%(asctime)s -- %(message)s',
-                        datefmt='%m/%d/%Y %H:%M:%S')
-    logging.info("***** Starting Feature Processing *****")
-
-    if not os.path.exists(meta_path):
-        raise Exception("Directory for meta data does not exists")
-
-    if not os.path.exists(proc_path):
-        raise Exception("Directory for feature data does not exists")
-
-    if not os.path.exists(target_path):
-        os.makedirs(target_path)
-
-    if not os.path.exists(production_path):
-        os.makedirs(production_path)
-
-    clf = Classifier(production_path)
-    train_files = sorted([f for f in os.listdir(proc_path) if (f.endswith(".bz2")) and (not f.endswith("2016_03.bz2"))])
-    logging.info("Will process files for mappings and counters: \n" + ",\n".join(train_files))
-
-    data = dd.concat([dd.read_csv(urlpath=os.path.join(proc_path, f),
-                                  dtype=data_dtypes,
-                                  compression="bz2", blocksize=None)
-                      for f in train_files])
-
-    clf.create_mappings(data)
-    del data
-
-    meta = dd.read_csv(os.path.join(meta_path, "wdvc16_meta.csv"),
-                       dtype=meta_dtypes)
-    clf.create_mappings(meta)
+def main():
+    args = parser.parse_args()
+
+    base_path = os.path.abspath(args.dir)
+    fmt = args.format
+    valid_file = "wdvc16_2016_03" + extensions[fmt]
+
+    meta_path = os.path.join(base_path, "meta")
+    proc_path = os.path.join(base_path, "proc_data")
+    target_path = os.path.join(base_path, "encoded_data")
+    production_path = os.path.join(base_path, "production")
+
+    try:
+        logging.basicConfig(filename=os.path.join(base_path, "pre_proc.log"),
+                            level=logging.DEBUG, format='%(asctime)s -- %(message)s',
+                            datefmt='%m/%d/%Y %H:%M:%S')
+        logging.info("***** Starting Feature Processing *****")
+
+        if not os.path.exists(meta_path):
+            raise Exception("Directory for meta data does not exists")
+
+        if not os.path.exists(proc_path):
+            raise Exception("Directory for feature data does not exists")
+
+        if not os.path.exists(target_path):
+            os.makedirs(target_path)
+
+        if not os.path.exists(production_path):
+            os.makedirs(production_path)
+
+        clf = Classifier(production_path)
+        train_files = [f for f in data_files(proc_path, fmt) if f != valid_file]
+        logging.info("Will process files for mappings and counters: \n" + ",\n".join(train_files))
+
+        # one pass over every file (and the meta) for all the mappers, tags and counters
+        dtypes = dict(data_dtypes, **meta_dtypes)
+        categorical = [c for c in sorted(dtypes) if (dtypes[c] is str) and (c != "timestamp")]
+        counted = ["itemid", "userid"]
+        mapping_cols = [c for c in sorted(data_dtypes) if (c in categorical) or (c in counted)]
+        sources = [(f, partial(iter_frames, os.path.join(proc_path, f), fmt, args.chunk,
+                               dtype=data_dtypes, columns=mapping_cols)) for f in train_files]
+        sources.append(("wdvc16_meta.csv", partial(pd.read_csv, os.path.join(meta_path, "wdvc16_meta.csv"),
+                                                   dtype=meta_dtypes, chunksize=args.chunk)))
+
+        start = timer()
+        sketch = (args.eps, args.delta) if args.counters == "sketch" else None
+        mappings = scan(sources, categorical, counted, args.n_jobs, sketch)
+        for name, rows, enlapsed in mappings.timings:
+            logging.info("scanned {0}: {1} rows in {2:.1f}s".format(name, rows, enlapsed))
+        logging.info("scan phase: {0:.1f}s".format(timer() - start))
+
+        start = timer()
+        clf.create_mappings(mappings)
+        del mappings
+        logging.info("write phase: {0:.1f}s".format(timer() - start))
+        for c, counter in sorted(clf.counters.items()):
+            logging.info("{0} counter: {1}, {2:.1f} MB".format(c, counter.kind, counter.nbytes() / 2 ** 20))
+
+        logging.info("Done computing mappings and counters")
+        logging.info("Will process files for training: \n" + ",\n".join(train_files[-5:]))
+
+        meta = pd.read_csv(os.path.join(meta_path, "wdvc16_meta.csv"),
+                           index_col="REVISION_ID",  dtype=meta_dtypes)
+
+        for f in train_files[-5:]:
+            data = read_frame(os.path.join(proc_path, f), fmt, dtype=data_dtypes)
+            data = data.join(meta, on="revisionid")
+            write_frame(clf.apply_mappings(data), os.path.join(target_path, f), fmt)
+            del data
+            gc.collect()
+        del meta
+        gc.collect()
 
-    logging.info("Done computing mappings and counters")
-    logging.info("Will process files for training: \n" + ",\n".join(train_files[-5:]))
+        logging.info("Will process " + valid_file + " for validation")
+        data = read_frame(os.path.join(proc_path, valid_file), fmt, dtype=data_dtypes)
+        data = data.join(pd.read_csv(os.path.join(meta_path, "wdvc16_2016_03_meta.csv"),
+                                     index_col="REVISION_ID", dtype=meta_dtypes),
+                                     on="revisionid")
+        write_frame(clf.apply_mappings(data), os.path.join(target_path, valid_file), fmt)
 
-    meta = pd.read_csv(os.path.join(meta_path, "wdvc16_meta.csv"),
-                       index_col="REVISION_ID",  dtype=meta_dtypes)
+    except Exception as e:
+        logging.exception("***** An error ocurred *****")
+    finally:
+        logging.info("***** Finished *****")
 
-    for f in train_files[-5:]:
-        data = pd.read_csv(os.path.join(proc_path, f), dtype=data_dtypes, compression="bz2")
-        data = data.join(meta, on="revisionid")
-        clf.apply_mappings(data).to_csv(os.path.join(target_path, f),
-                                        index=False, float_format='%.4g',
-                                        compression="bz2", encoding="utf-8")
-        del data
-        gc.collect()
-    del meta
-    gc.collect()
-
-    logging.info("Will process wdvc16_2016_03.bz2 for validation")
-    data = pd.read_csv(os.path.join(proc_path, "wdvc16_2016_03.bz2"),
-                       dtype=data_dtypes, compression="bz2")
-    data = data.join(pd.read_csv(os.path.join(meta_path, "wdvc16_2016_03_meta.csv"),
-                                 index_col="REVISION_ID", dtype=meta_dtypes),
-                                 on="revisionid")
-    clf.apply_mappings(data).to_csv(os.path.join(target_path, "wdvc16_2016_03.bz2"),
-                       index=False, float_format='%.4g',
-                       compression="bz2", encoding="utf-8")
-
-except Exception as e:
-    logging.exception("***** An error ocurred *****")
-finally:
-    logging.info("***** Finished *****")
 
+# scan runs a process pool, whose workers import this module again on spawn
+if __name__ == "__main__":
+    main()
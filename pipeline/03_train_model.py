@@ -14,23 +14,74 @@ import pandas as pd
 import numpy as np
 import joblib
 
+import xgboost
 from xgboost import XGBClassifier
 from sklearn.metrics import roc_auc_score
 
+from data_io import extensions, read_frame, iter_frames
+from utils import peak_rss_mb
+from classifier import Classifier
+from features import FeatureEncoder
+from encoders import load_priv_users
+
 ########## CONFIG ###########
 
 parser = argparse.ArgumentParser(description='WSDM Cup Model Trainer')
 parser.add_argument('-dir', action = "store", dest = "dir", help = 'working directory', required = True)
+parser.add_argument('-format', action = "store", dest = "format", default = "csv", choices = ["csv", "parquet"], help = 'format of the encoded_data files')
+parser.add_argument('-memory', action = "store", dest = "memory", default = "dense", choices = ["dense", "external", "quantile"],
+                    help = 'dense: one in memory frame, external: xgboost external memory DMatrix, quantile: QuantileDMatrix built from chunks')
+parser.add_argument('-chunk', action = "store", dest = "chunk", type = int, default = 1000000, help = 'rows per chunk for external and quantile')
+args = parser.parse_args()
 
-base_path = os.path.abspath(parser.parse_args().dir)
+base_path = os.path.abspath(args.dir)
+fmt = args.format
 
 truth_path = os.path.join(base_path, "truth")
 proc_path = os.path.join(base_path, "encoded_data")
 production_path = os.path.join(base_path, "production")
 models_path = os.path.join(production_path, "models")
+cache_path = os.path.join(base_path, "xgb_cache")
+
+params = {"objective": "binary:logistic", "max_depth": 7, "learning_rate": 0.1,
+          "eval_metric": "auc", "tree_method": "hist"}
 
 ########## SCRIPT ###########
 
+def prepare(df, features):
+    # priv_user from the exact userid, before it is rounded to float32
+    df = features.add_users(df.set_index("revisionid").drop("REVISION_SESSION_ID", axis=1))
+    return df.astype(np.float32).fillna(0)
+
+
+class EncodedChunks(getattr(xgboost, "DataIter", object)):
+
+    def __init__(self, files, labels, features, cache_prefix=None):
+        self.files = files
+        self.labels = labels
+        self.features = features
+        self.columns = None
+        self.chunks = None
+        super(EncodedChunks, self).__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self.chunks = None
+
+    def next(self, input_data):
+        if self.chunks is None:
+            self.chunks = (c for f in self.files for c in iter_frames(f, fmt, args.chunk))
+        try:
+            chunk = prepare(next(self.chunks), self.features)
+        except StopIteration:
+            return 0
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+        chunk = chunk.reindex(columns=self.columns, fill_value=-1)
+        input_data(data=chunk.values, label=self.labels.reindex(chunk.index).values,
+                   feature_names=self.columns)
+        return 1
+
+
 try:
     logging.basicConfig(filename=os.path.join(base_path, "train_model.log"),
                         level=logging.DEBUG, format='%(asctime)s -- %(message)s',
@@ -48,7 +99,7 @@ try:
 
     os.makedirs(models_path)
 
-    train_files = sorted([os.path.join(proc_path, f) for f in os.listdir(proc_path) if f.endswith(".bz2")])
+    train_files = sorted([os.path.join(proc_path, f) for f in os.listdir(proc_path) if f.endswith(extensions[fmt])])
     truth_files = sorted([os.path.join(truth_path, f) for f in os.listdir(truth_path) if f.endswith(".csv")])
 
     logging.info("train files:\n" + ",\n".join(train_files))
@@ -57,39 +108,78 @@ try:
     logging.info("Constructing Training Datasets")
 
     labels = pd.concat([(pd.read_csv(f, index_col="REVISION_ID")["ROLLBACK_REVERTED"] == "T").astype(np.float32) for f in truth_files])
-    priv_users = pd.read_csv("priv_users.csv", index_col="userid").astype(np.float32)
-    priv_users.columns = ["priv_user"]
-    train = pd.concat([pd.read_csv(f, index_col="revisionid").drop("REVISION_SESSION_ID", axis=1).astype(np.float32) for f in train_files])
-
-    train = train.join(priv_users, on="userid").fillna(0)
-    train["is_reg"] = (train.userid != -1).astype(np.float32)
-
-    y_train = labels.ix[train.index]
-
-    logging.info("Training Model")
-
-    learner = XGBClassifier(n_estimators=200, max_depth=7)
-    learner.fit(train, y_train,
-                eval_set=[(train, y_train)],
-                eval_metric="auc", early_stopping_rounds=200)
+    features = FeatureEncoder(priv_users=load_priv_users("priv_users.csv"))
 
     learner_path = os.path.join(models_path, "model")
     os.mkdir(learner_path)
-    learner_path = os.path.join(learner_path, "model.pkl")
-    joblib.dump(learner, learner_path)
+
+    if args.memory == "dense":
+        train = pd.concat([prepare(read_frame(f, fmt), features) for f in train_files])
+
+        y_train = labels.ix[train.index]
+        train_cols = [c for c in train.columns]
+        logging.info("peak RSS after loading: {0:.0f} MB".format(peak_rss_mb()))
+
+        logging.info("Training Model")
+
+        learner = XGBClassifier(n_estimators=200, max_depth=7)
+        learner.fit(train, y_train,
+                    eval_set=[(train, y_train)],
+                    eval_metric="auc", early_stopping_rounds=200)
+
+        joblib.dump(learner, os.path.join(learner_path, "model.pkl"))
+    else:
+        if not hasattr(xgboost, "DataIter"):
+            raise Exception("-memory " + args.memory + " needs xgboost 1.5 or newer")
+        if (args.memory == "quantile") and not hasattr(xgboost, "QuantileDMatrix"):
+            raise Exception("-memory quantile needs xgboost 1.7 or newer")
+        if args.memory == "external":
+            if not os.path.exists(cache_path):
+                os.makedirs(cache_path)
+            chunks = EncodedChunks(train_files, labels, features,
+                                   cache_prefix=os.path.join(cache_path, "train"))
+            train = xgboost.DMatrix(chunks)
+        else:
+            chunks = EncodedChunks(train_files, labels, features)
+            train = xgboost.QuantileDMatrix(chunks)
+        train_cols = chunks.columns
+        logging.info("peak RSS after loading: {0:.0f} MB".format(peak_rss_mb()))
+
+        logging.info("Training Model")
+
+        learner = xgboost.train(params, train, num_boost_round=200,
+                                evals=[(train, "train")], early_stopping_rounds=200)
+
+        learner.save_model(os.path.join(learner_path, "model.json"))
+        del train
+        shutil.rmtree(cache_path, ignore_errors=True)
+
+    logging.info("peak RSS after training: {0:.0f} MB".format(peak_rss_mb()))
 
     logging.info("Copying files to production folder")
 
-    train_cols = ",".join([c for c in train.columns])
     with open(os.path.join(models_path, "train_cols.csv"), "w") as f:
-        f.write(train_cols)
+        f.write(",".join(train_cols))
 
     shutil.copy("priv_users.csv", models_path)
 
-    for py_file in ["classifier.py", "rev_parser.py", "utils.py", "Client.py"]:
+    for lang_file in ["lang_cache.json", "lang_candidates.csv"]:
+        if os.path.exists(os.path.join(base_path, lang_file)):
+            shutil.copy(os.path.join(base_path, lang_file), models_path)
+
+    for py_file in ["classifier.py", "rev_parser.py", "utils.py", "Client.py",
+                    "lexicon.py", "char_features.py", "lang_cache.py", "lang_subset.py",
+                    "similarity.py", "entity.py", "encoders.py", "bundle.py",
+                    "session_store.py", "features.py"]:
         shutil.copy(py_file, production_path)
 
+    logging.info("Building model bundle")
+
+    clf = Classifier(production_path)
+    clf.save_bundle()
+    logging.info("bundle written to " + clf.bundle_file + ", {0:.1f} MB".format(os.path.getsize(clf.bundle_file) / 2 ** 20))
+
 except Exception as e:
     logging.exception("***** An error ocurred *****")
 finally:
-    logging.info("***** Finished *****")
\ No newline at end of file
+    logging.info("***** Finished *****")
@@ -9,37 +9,143 @@ Created on Fri Dec 2 12:35:03 2016
 import socket
 import sys
 import struct
-import re
 import argparse
+import threading
+import queue
+import time
 
 from classifier import Classifier
 
-clf = Classifier("./")
-
-# Read message length and unpack it into an integer
-def recv_msg(sock):
-    raw_msglen = recvall(sock, 4)
-
-    if not raw_msglen:
-        return None
-
-    msglen = struct.unpack('>I', raw_msglen)[0]
-
-    return recvall(sock, msglen)
+# Reads length prefixed messages into one reusable buffer with recv_into and
+# decodes each message straight from it, without intermediate copies
+class MessageReader(object):
+
+    def __init__(self, sock, size=2 ** 20):
+        self.sock = sock
+        self.buf = bytearray(size)
+        self.start = 0 # first unread byte
+        self.end = 0 # end of received data
+
+    # Make sure n bytes are buffered from start, False if EOF is hit
+    def fill(self, n):
+        if self.end - self.start >= n:
+            return True
+        if self.start + n > len(self.buf):
+            available = self.end - self.start
+            if n > len(self.buf):
+                buf = bytearray(max(n, 2 * len(self.buf)))
+                buf[:available] = self.buf[self.start:self.end]
+                self.buf = buf
+            else:
+                self.buf[:available] = self.buf[self.start:self.end]
+            self.start, self.end = 0, available
+        view = memoryview(self.buf)
+        try:
+            while self.end - self.start < n:
+                received = self.sock.recv_into(view[self.end:])
+                if not received:
+                    return False
+                self.end += received
+        finally:
+            view.release()
+        return True
+
+    # Read message length, unpack it into an integer and return the decoded message
+    def recv_msg(self):
+        if not self.fill(4):
+            return None
+        msglen = struct.unpack_from('>I', self.buf, self.start)[0]
+        if not self.fill(4 + msglen):
+            return None
+        start = self.start + 4
+        self.start = start + msglen
+        with memoryview(self.buf) as view:
+            return str(view[start:self.start], 'utf-8')
 
-# Helper function to recv n bytes or return None if EOF is hit
-def recvall(sock, n):
-    data = b''
+# Stage 1: read framed messages and pair each metadata message with its revision
+def receiver(sock, requests):
+    counter = 1 # for demultiplexer
+    metadata = ''
+    reader = MessageReader(sock)
+    try:
+        while True:
+            reply = reader.recv_msg()
 
-    while len(data) < n:
-        packet = sock.recv(n - len(data))
+            #No more data coming from the Server
+            if reply == None:
+                print('IN PROGRESS: Revisions processed completely')
+                break
 
-        if not packet:
-            return None
+            if counter % 2 == 0:
+                requests.put((metadata, reply))
+                metadata = ''
+            else:
+                metadata = metadata + reply
 
-        data = data + packet
+            counter = counter + 1
+    except socket.error:
+        print('ERROR: Cannot receive message from server')
+    finally:
+        requests.put(None)
 
-    return data
+# Stage 2: score revisions in arrival order, coalescing up to batch_size of them
+# or whatever arrives within max_wait seconds of the first one
+def scorer(clf, requests, answers, errors, batch_size, max_wait):
+    try:
+        done = False
+        while not done:
+            request = requests.get()
+            if request is None:
+                break
+            batch = [request]
+            deadline = time.time() + max_wait
+            while len(batch) < batch_size:
+                timeout = deadline - time.time()
+                try:
+                    if timeout > 0:
+                        request = requests.get(timeout=timeout)
+                    else:
+                        request = requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    done = True
+                    break
+                batch.append(request)
+            for answer in clf.predict_proba_batch(batch):
+                answers.put(answer)
+        # sessions and online counts are only touched by this thread
+        clf.checkpoint()
+    except Exception as e:
+        print('ERROR: Cannot score revisions:', e)
+        errors.append(True)
+    finally:
+        # the sender stops on None, whatever happened here
+        answers.put(None)
+
+# Stage 3: send every answer that is ready in a single write
+def sender(sock, answers, errors):
+    pending = 'REVISION_ID,VANDALISM_SCORE\r\n' # CVS Header and upcoming results
+    done = False
+    while not done:
+        batch = [answers.get()]
+        while not answers.empty():
+            batch.append(answers.get())
+        for answer in batch:
+            if answer is None:
+                done = True
+                break
+            revisionID, vandalismScore = answer
+            pending = pending + revisionID + ',' + vandalismScore + '\r\n'
+        if pending:
+            try:
+                sock.sendall(pending.encode())
+                pending = ''
+            except socket.error:
+                # Send failed
+                print('ERROR: Cannot send message to server')
+                errors.append(True)
+                return
 
 #Main function
 def main():
@@ -47,29 +153,27 @@ def main():
     parser = argparse.ArgumentParser(description='WSDM Cup Client')
     parser.add_argument('-d', action = "store", dest = "d", help = 'HOST_NAME:PORT', required = True)
     parser.add_argument('-a', action = "store", dest="a", help = 'AUTHENTICATION_TOKEN', required = True)
+    parser.add_argument('-w', action = "store", dest="w", type = int, default = 32, help = 'max revisions in flight between stages')
+    parser.add_argument('-b', action = "store", dest="b", type = int, default = 16, help = 'max revisions scored together')
+    parser.add_argument('-t', action = "store", dest="t", type = float, default = 0, help = 'max milliseconds to wait for a batch to fill')
+    parser.add_argument('-m', action = "store", dest="m", type = int, default = 2 ** 20, help = 'max sessions kept for the session mean, 0 for no limit')
+    parser.add_argument('-i', action = "store", dest="i", type = int, default = 0, help = 'drop sessions idle for more than this many revision ids, 0 to keep them')
+    parser.add_argument('-l', action = "store", dest="l", type = float, default = 0, help = 'drop sessions idle for more than this many seconds, 0 to keep them')
+    parser.add_argument('-s', action = "store", dest="s", help = 'sessions snapshot file, loaded at start and saved at the end')
+    parser.add_argument('-o', action = "store_true", dest="o", help = 'update the itemid and userid counts with the revisions scored')
+    parser.add_argument('-c', action = "store", dest="c", help = 'online counts snapshot file, loaded at start and saved at the end')
+    parser.add_argument('-e', action = "store", dest="e", type = int, default = 0, help = 'also save the sessions and online counts snapshots every this many revisions')
     args = parser.parse_args()
 
+    clf = Classifier("./", max_sessions=args.m, max_idle_revs=args.i, max_idle_secs=args.l,
+                     sessions_file=args.s, online_counts=args.o, counts_file=args.c, checkpoint_every=args.e)
+
     #Variable Definition
     host = args.d[0:args.d.find(":")]
     port = int(args.d[args.d.find(":")+1:])
 
     auth_token = args.a.encode() + b'\r\n' # for the server to start sending revisions
 
-    metadata = b'' # for metadata
-    metadataHeader = '' #for metadataHeader
-
-    revision = b'' # for revision
-    revisionHeader = '' #for revisionHeader
-
-    counter = 1 # for demultiplexer
-    flagRevisionHeader = False # for revisionHeader
-    flagMetadataHeader = False # for metadataHeader
-
-    revisionID = '' # output revisionID
-    vandalismScore = '' #output vandalismScore
-
-    answers = 'REVISION_ID,VANDALISM_SCORE\r\n' # CVS Header and upcoming results
-
     #Creates a AF_INET, STREAM socket
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -92,57 +196,25 @@ def main():
         print('ERROR: Cannot send message to server')
         sys.exit()
 
-    #Communicate with the server
-    while True:
-        #Get message
-        reply = recv_msg(s)
-
-        #Keep the Headers in case they are necessary
-        if flagMetadataHeader == False and counter % 2 != 0:
-            searchOut = re.search(r'[0-9]+', reply.decode('utf-8'))
-            metadataHeader = reply.decode('utf-8')[0:searchOut.span()[0]]
-            flagMetadataHeader = True
-
-        if flagRevisionHeader == False and reply.decode('utf-8').find("<page>") != -1 and counter % 2 == 0:
-            length = reply.decode('utf-8').find("<page>")
-            revisionHeader = reply.decode('utf-8')[0:length]
-            flagRevisionHeader = True
-
-        #Demultiplex metadata and revision. Call to classifier. Re-initialize revision and metadata. Answer Server
-        if counter % 2 == 0 and reply != None:
-            revision = revision + reply
-
-            revisionID, vandalismScore = clf.predict_proba(metadata.decode('utf-8'), revision.decode('utf-8'))
-
-            revision = b''
-            metadata = b''
-
-            answers = answers + revisionID + ',' + vandalismScore + '\r\n'
-
-            try:
-                s.sendall(answers.encode())
-                answers = ''
-
-            except socket.error:
-                # Send failed
-                print('ERROR: Cannot send message to server')
-                sys.exit()
-
-        elif counter % 2 != 0 and reply != None:
-            metadata = metadata + reply
-
-        #No more data coming from the Server
-        if reply == None:
-            print('IN PROGRESS: Revisions processed completely')
-            break;
-
-        counter = counter + 1
+    #Communicate with the server, receiving, scoring and answering run concurrently
+    requests = queue.Queue(maxsize=args.w)
+    answers = queue.Queue(maxsize=args.w)
+    errors = []
+    stages = [threading.Thread(target=receiver, args=(s, requests)),
+              threading.Thread(target=scorer, args=(clf, requests, answers, errors, args.b, args.t / 1000.0)),
+              threading.Thread(target=sender, args=(s, answers, errors))]
+    for stage in stages:
+        stage.daemon = True
+        stage.start()
+    stages[-1].join()
+
+    if errors:
+        sys.exit()
 
     #Closes socket
     s.close()
     print('COMPLETE')
 
 #Program Execution
-if __name__ == main():
+if __name__ == "__main__":
     main()
-
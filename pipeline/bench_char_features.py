@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:58:12 2026
+
+Compares tails/sec of the per character loop parse_tail used against the
+lookup table char_features, one tail at a time and in batches, on the
+comments of a dump.
+"""
+########## IMPORTS ###########
+import argparse
+import unicodedata as ud
+from itertools import islice
+from timeit import default_timer as timer
+
+from scipy import stats
+
+from char_features import char_features, char_features_batch
+from rev_parser import revision_generator
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup character features benchmark')
+parser.add_argument('-file', action = "store", dest = "file", help = 'xml dump, uncompressed', required = True)
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 100000, help = 'revisions to read')
+parser.add_argument('-batch', action = "store", dest = "batch", type = int, default = 2000, help = 'tails per batch')
+args = parser.parse_args()
+
+########## SCRIPT ###########
+
+tails = [case["comment"] for case in islice(revision_generator(args.file), args.n) if case.get("comment")]
+
+# The loop parse_tail used before char_features
+def loop_features(tail):
+    char_feats = {
+        "upperCaseRatio": 0,
+        "lowerCaseRatio": 0,
+        "simbolRatio": 0,
+        "alphanumericRatio": 0,
+        "digitRatio": 0,
+        "punctuationRatio": 0,
+        "bracketRatio": 0,
+        "whitespaceRatio": 0,
+        "latinRatio": 0,
+        "nonLatinRatio": 0
+    }
+
+    alphabets = []
+    prev_char = ""
+    char_seq = [1]
+    for t in tail:
+        if t == prev_char:
+            char_seq[-1] += 1
+        else:
+            char_seq.append(1)
+        prev_char = t
+        if t == " ":
+            char_feats["whitespaceRatio"] += 1
+        elif t in ",.;:´¨'\"?¿!¡":
+            char_feats["punctuationRatio"] += 1
+        elif t in "&%$#@+-_*/\\":
+            char_feats["simbolRatio"] += 1
+        elif t in "{}[]()":
+            char_feats["bracketRatio"] += 1
+        elif t.isupper():
+            char_feats["upperCaseRatio"] += 1
+        elif t.islower():
+            char_feats["lowerCaseRatio"] += 1
+            char_feats["alphanumericRatio"] += 1
+        elif t in "1234567890":
+            char_feats["digitRatio"] += 1
+            char_feats["alphanumericRatio"] += 1
+        alphabets.append(ud.name(t, "unknown").split(" ")[0])
+        if alphabets[-1] == "LATIN":
+            char_feats["latinRatio"] += 1
+        else:
+            char_feats["nonLatinRatio"] += 1
+    tl = len(tail)
+    char_feats = {k: char_feats[k] / tl for k in char_feats.keys()}
+    char_feats["main_alphabet"] = stats.mode(alphabets)[0][0]
+    char_feats["longestCharacterSequence"] = max(char_seq)
+    return char_feats
+
+def run(name, func):
+    start = timer()
+    res = func()
+    enlapsed = timer() - start
+    print("{0:<10} {1} tails in {2:.2f}s, {3:.0f} tails/sec".format(name, len(res), enlapsed, len(res) / enlapsed))
+    return res
+
+char_features_batch(tails) # fill the lookup tables, as a long running parse would have
+old = run("loop", lambda: [loop_features(t) for t in tails])
+single = run("single", lambda: [char_features(t) for t in tails])
+batch = run("batch", lambda: [f for i in range(0, len(tails), args.batch) for f in char_features_batch(tails[i:i + args.batch])])
+
+if not (old == single == batch):
+    print("WARNING: features disagree")
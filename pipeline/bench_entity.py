@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:20:37 2026
+
+Compares revisions/sec of decoding the whole item json against the lazy
+Entity fields on the texts of a dump: id and P31 for every revision, plus
+the labels and sitelinks maps on a share of them, as label and sitelink
+edits need.
+"""
+########## IMPORTS ###########
+import gc
+import json
+import argparse
+from itertools import islice
+from timeit import default_timer as timer
+
+from entity import Entity, orjson
+from rev_parser import revision_generator
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup entity json benchmark')
+parser.add_argument('-file', action = "store", dest = "file", help = 'xml dump, plain or compressed', required = True)
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 20000, help = 'revisions to read')
+parser.add_argument('-maps', action = "store", dest = "maps", type = int, default = 4, help = 'read labels and sitelinks every this many revisions, 0 for never')
+args = parser.parse_args()
+
+########## SCRIPT ###########
+
+texts = [case["text"] for case in islice(revision_generator(args.file), args.n) if "text" in case]
+print("{0} texts, {1:.1f} KB on average, orjson: {2}".format(len(texts), sum(map(len, texts)) / max(len(texts), 1) / 1024, orjson is not None))
+
+def full(i, text):
+    obj = json.loads(text)
+    try:
+        p31 = obj["claims"]["P31"][0]["mainsnak"]["datavalue"]["value"]["numeric-id"]
+    except:
+        p31 = None
+    res = [obj.get("id", "-1"), p31]
+    if args.maps and i % args.maps == 0:
+        res += [obj.get("labels", {}), obj.get("sitelinks", {})]
+    return res
+
+def lazy(i, text):
+    obj = Entity(text)
+    res = [obj.item_id(), obj.instance_of()]
+    if args.maps and i % args.maps == 0:
+        res += [obj.get("labels", {}), obj.get("sitelinks", {})]
+    return res
+
+# collections triggered by the previous run's objects would be billed to the next one
+def run(name, func):
+    gc.collect()
+    gc.disable()
+    start = timer()
+    res = [func(i, text) for i, text in enumerate(texts)]
+    enlapsed = timer() - start
+    gc.enable()
+    print("{0:<10} {1} revisions in {2:.2f}s, {3:.0f} revisions/sec".format(name, len(res), enlapsed, len(res) / max(enlapsed, 1e-9)))
+    return res
+
+old = run("json.loads", full)
+new = run("Entity", lazy)
+
+if old != new:
+    print("WARNING: fields disagree on {0} revisions".format(sum(1 for a, b in zip(old, new) if a != b)))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:02:44 2026
+
+Compares lang_prob computed with the full langid model against langid
+restricted to candidate languages, on the label, alias and description
+edits of a dump: calls/sec of each (without the cache) and how far the
+restricted lang_prob is from the full one.
+"""
+########## IMPORTS ###########
+import argparse
+from itertools import islice
+from timeit import default_timer as timer
+
+import numpy as np
+
+import rev_parser
+from rev_parser import revision_generator, parse_revision, init_identifier
+from lang_subset import SubsetIdentifier
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup restricted langid benchmark')
+parser.add_argument('-file', action = "store", dest = "file", help = 'xml dump, plain or compressed', required = True)
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 100000, help = 'revisions to read')
+parser.add_argument('-candidates', action = "store", dest = "candidates", default = "en,de,fr,es,it,nl,ru,pt,sv,pl,ja,zh",
+                    help = 'comma separated candidate languages')
+args = parser.parse_args()
+
+########## SCRIPT ###########
+
+# collect the (tail, lang) pairs the parser asks lang_probs for
+calls = []
+lang_probs = rev_parser.lang_probs
+rev_parser.lang_probs = lambda tail, lang: calls.append((tail, lang)) or lang_probs(tail, lang)
+for case in islice(revision_generator(args.file), args.n):
+    parse_revision(case)
+rev_parser.lang_probs = lang_probs
+calls = [(tail, lang) for tail, lang in calls if len(tail) > 0]
+
+identifier = init_identifier()
+subset = SubsetIdentifier(identifier, [l.strip() for l in args.candidates.split(",")])
+
+def full_prob(tail, lang):
+    lang_2, prob = identifier.classify(tail)
+    return (lang == lang_2), prob if lang == lang_2 else 1 - prob
+
+def subset_prob(tail, lang):
+    lang_2, prob = subset.classify(tail, lang)
+    return (lang == lang_2), prob if lang == lang_2 else 1 - prob
+
+def run(name, func):
+    start = timer()
+    res = [func(tail, lang) for tail, lang in calls]
+    enlapsed = timer() - start
+    print("{0:<8} {1} calls in {2:.2f}s, {3:.0f} calls/sec".format(name, len(res), enlapsed, len(res) / enlapsed))
+    return np.array([r[0] for r in res]), np.array([r[1] for r in res])
+
+full_wins, full = run("full", full_prob)
+subset_wins, restricted = run("subset", subset_prob)
+
+if len(calls) > 0:
+    diff = np.abs(full - restricted)
+    print("claimed language wins in both: {0:.1%}".format(np.mean(full_wins == subset_wins)))
+    print("lang_prob abs diff: mean {0:.4f}, p90 {1:.4f}, max {2:.4f}".format(diff.mean(), np.percentile(diff, 90), diff.max()))
+    if len(calls) > 1 and full.std() > 0 and restricted.std() > 0:
+        print("lang_prob correlation: {0:.4f}".format(np.corrcoef(full, restricted)[0, 1]))
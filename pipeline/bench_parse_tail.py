@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:41:07 2026
+
+Compares words/sec of the bad word and language word checks of parse_tail,
+the per word regex and list scan against the Lexicon sets, on the words of
+the comments of a dump.
+"""
+########## IMPORTS ###########
+import re
+import argparse
+from itertools import islice
+from timeit import default_timer as timer
+
+import utils
+from rev_parser import revision_generator, lang_regex, lang_words, bad_words
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup parse_tail word lists benchmark')
+parser.add_argument('-file', action = "store", dest = "file", help = 'xml dump, uncompressed', required = True)
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 100000, help = 'revisions to read')
+parser.add_argument('-repeat', action = "store", dest = "repeat", type = int, default = 5, help = 'passes over the words')
+args = parser.parse_args()
+
+########## SCRIPT ###########
+
+words = []
+for case in islice(revision_generator(args.file), args.n):
+    words.extend(re.findall(r"\w+", case.get("comment", "")))
+
+def old_check(word):
+    if lang_regex.search(word):
+        return 1
+    elif word.lower() in utils.bad_words:
+        return 2
+    return 0
+
+def new_check(word):
+    if word in lang_words:
+        return 1
+    elif word in bad_words:
+        return 2
+    return 0
+
+def run(name, check):
+    start = timer()
+    for _ in range(args.repeat):
+        res = [check(w) for w in words]
+    enlapsed = timer() - start
+    n = len(words) * args.repeat
+    print("{0:<10} {1} words in {2:.2f}s, {3:.0f} words/sec".format(name, n, enlapsed, n / enlapsed))
+    return res
+
+old = run("regex", old_check)
+new = run("lexicon", new_check)
+
+if old != new:
+    print("WARNING: checks disagree on {0} words".format(sum(1 for a, b in zip(old, new) if a != b)))
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:41:27 2026
+
+Replays a recorded stream of length prefixed messages from a local socket
+and measures how fast the Client reads it, comparing the original
+recvall/recv_msg loop against Client.MessageReader.
+
+A stream can be recorded from a dump with -record, every revision becomes
+a metadata message followed by a revision message as replay_server.py
+sends them.
+"""
+########## IMPORTS ###########
+import socket
+import struct
+import argparse
+import threading
+from timeit import default_timer as timer
+
+from Client import MessageReader
+from replay_server import stream_messages
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup Client receive benchmark')
+parser.add_argument('-stream', action = "store", dest = "stream", help = 'recorded stream to replay', required = True)
+parser.add_argument('-record', action = "store", dest = "record", help = 'xml dump to record the stream from')
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 100000, help = 'revisions to record')
+parser.add_argument('-repeat', action = "store", dest = "repeat", type = int, default = 3, help = 'runs per reader')
+
+########## SCRIPT ###########
+
+def record(dump_file, stream_file, n):
+    with open(stream_file, "wb") as out:
+        for revid, meta, rev in stream_messages(dump_file, n=n):
+            out.write(meta)
+            out.write(rev)
+
+
+# Original implementation of the Client, kept as the baseline
+def recv_msg(sock):
+    raw_msglen = recvall(sock, 4)
+
+    if not raw_msglen:
+        return None
+
+    msglen = struct.unpack('>I', raw_msglen)[0]
+
+    return recvall(sock, msglen)
+
+
+def recvall(sock, n):
+    data = b''
+
+    while len(data) < n:
+        packet = sock.recv(n - len(data))
+
+        if not packet:
+            return None
+
+        data = data + packet
+
+    return data
+
+
+def read_original(sock):
+    messages = 0
+    while True:
+        reply = recv_msg(sock)
+        if reply is None:
+            return messages
+        # main decoded every reply up to four times
+        for _ in range(4):
+            reply.decode('utf-8')
+        messages += 1
+
+
+def read_buffered(sock):
+    messages = 0
+    reader = MessageReader(sock)
+    while reader.recv_msg() is not None:
+        messages += 1
+    return messages
+
+
+def serve(data, srv):
+    conn, _ = srv.accept()
+    conn.sendall(data)
+    conn.close()
+
+
+def run(name, read, data):
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(1)
+    server = threading.Thread(target=serve, args=(data, srv))
+    server.start()
+    sock = socket.create_connection(srv.getsockname())
+    start = timer()
+    messages = read(sock)
+    enlapsed = timer() - start
+    server.join()
+    sock.close()
+    srv.close()
+    print("{0:<10} {1} messages in {2:.2f}s, {3:.0f} messages/sec, {4:.1f} MB/s".format(
+        name, messages, enlapsed, messages / enlapsed, len(data) / enlapsed / 2 ** 20))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.record:
+        record(args.record, args.stream, args.n)
+    with open(args.stream, "rb") as f:
+        data = f.read()
+    for _ in range(args.repeat):
+        run("original", read_original, data)
+        run("buffered", read_buffered, data)
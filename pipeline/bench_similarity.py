@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:15:03 2026
+
+Compares the similarity backends on the label_link_similarity calls of a
+dump: calls/sec of the old per candidate fuzz loop and of best_similarities
+with each backend, and whether they all give the same scores.
+"""
+########## IMPORTS ###########
+import argparse
+from collections import defaultdict
+from itertools import islice
+from timeit import default_timer as timer
+
+from fuzzywuzzy import fuzz
+
+import rev_parser
+from rev_parser import revision_generator, parse_revision
+from similarity import backends, best_similarities
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup similarity backends benchmark')
+parser.add_argument('-file', action = "store", dest = "file", help = 'xml dump, plain or compressed', required = True)
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 100000, help = 'revisions to read')
+parser.add_argument('-repeat', action = "store", dest = "repeat", type = int, default = 3, help = 'passes over the calls')
+args = parser.parse_args()
+
+########## SCRIPT ###########
+
+# collect the (tail, candidates) pairs the parser compares
+calls = []
+compute_similarities = rev_parser.compute_similarities
+rev_parser.compute_similarities = lambda tail, arr: calls.append((tail, arr)) or compute_similarities(tail, arr)
+for case in islice(revision_generator(args.file), args.n):
+    parse_revision(case)
+rev_parser.compute_similarities = compute_similarities
+print("{0} calls, {1} candidates".format(len(calls), sum(len(arr) for _, arr in calls)))
+
+# compute_similarities before the backends
+def fuzz_loop(tail, arr):
+    res = defaultdict(list)
+    for a in arr:
+        try:
+            res["fuzzy_total"].append(fuzz.ratio(tail, a))
+        except:
+            pass
+        try:
+            res["fuzzy_partial"].append(fuzz.partial_ratio(tail, a))
+        except:
+            pass
+    try:
+        res = {k: max(res[k]) for k in res.keys()}
+    except:
+        res = {}
+    return res
+
+def run(name, func):
+    start = timer()
+    for _ in range(args.repeat):
+        res = [func(tail, arr) for tail, arr in calls]
+    enlapsed = timer() - start
+    n = len(calls) * args.repeat
+    print("{0:<24} {1} calls in {2:.2f}s, {3:.0f} calls/sec".format(name, n, enlapsed, n / max(enlapsed, 1e-9)))
+    return res
+
+old = run("fuzz loop", fuzz_loop)
+for backend in sorted(backends):
+    new = run("best_similarities " + backend, lambda tail, arr: best_similarities(tail, arr, backend))
+    if new != old:
+        print("WARNING: {0} disagrees on {1} calls".format(backend, sum(1 for a, b in zip(old, new) if a != b)))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 12:15:52 2026
+
+Startup time of the production Classifier, loading the model, mappers and
+counters from the separate files or from models/bundle.bin. Every run is a
+fresh process, so nothing is shared with the previous one but the OS page
+cache. Imports and the langid model load the same way in both cases and
+are timed apart.
+"""
+########## IMPORTS ###########
+import os
+import sys
+import argparse
+import subprocess
+from timeit import default_timer as timer
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup Classifier startup benchmark')
+parser.add_argument('-dir', action = "store", dest = "dir", help = 'production directory', required = True)
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 5, help = 'runs of each mode')
+parser.add_argument('-build', action = "store_true", dest = "build", help = 'write the bundle from the separate files first')
+parser.add_argument('-load', action = "store", dest = "load", choices = ["files", "bundle"], help = argparse.SUPPRESS)
+args = parser.parse_args()
+
+########## SCRIPT ###########
+
+if args.load:
+    start = timer()
+    from classifier import Classifier
+    import rev_parser
+    rev_parser.init_identifier()
+    after_imports = timer()
+    Classifier(args.dir, use_bundle=args.load == "bundle")
+    print(after_imports - start, timer() - after_imports)
+    sys.exit(0)
+
+bundle_file = os.path.join(args.dir, "models", "bundle.bin")
+if args.build or not os.path.exists(bundle_file):
+    from classifier import Classifier
+    Classifier(args.dir, use_bundle=False).save_bundle()
+print("bundle: {0:.1f} MB".format(os.path.getsize(bundle_file) / 2 ** 20))
+
+for mode in ["files", "bundle"]:
+    times = []
+    for _ in range(args.n):
+        out = subprocess.check_output([sys.executable, os.path.abspath(__file__), "-dir", args.dir, "-load", mode])
+        times.append([float(t) for t in out.decode("utf-8").strip().splitlines()[-1].split()])
+    imports, startup = zip(*times)
+    print("{0:<6} imports and langid {1:.3f}s, Classifier() best {2:.3f}s, mean {3:.3f}s".format(
+        mode, min(imports), min(startup), sum(startup) / len(startup)))
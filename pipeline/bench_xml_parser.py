@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:40 2026
+
+Compares revisions/sec of the line based xml_generator against the byte
+level revision_generator on an uncompressed dump.
+"""
+########## IMPORTS ###########
+import argparse
+from itertools import islice
+from timeit import default_timer as timer
+
+from rev_parser import xml_generator, xml_to_case, revision_generator
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup XML splitter benchmark')
+parser.add_argument('-file', action = "store", dest = "file", help = 'uncompressed xml dump', required = True)
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 100000, help = 'revisions to read')
+parser.add_argument('-chunk', action = "store", dest = "chunk", type = int, default = 2 ** 24, help = 'read size in bytes for the byte splitter')
+args = parser.parse_args()
+
+########## SCRIPT ###########
+
+def run(name, gen):
+    start = timer()
+    cases = list(islice(gen, args.n))
+    enlapsed = timer() - start
+    print("{0:<20} {1} revisions in {2:.2f}s, {3:.0f} revisions/sec".format(name, len(cases), enlapsed, len(cases) / enlapsed))
+    return cases
+
+old = run("xml_generator", (xml_to_case(rev) for rev in xml_generator(args.file)))
+new = run("revision_generator", revision_generator(args.file, args.chunk))
+
+if old != new:
+    print("WARNING: generators disagree")
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:40:27 2026
+
+Single file with everything the Classifier loads at startup.
+
+03_train_model.py writes models/bundle.bin next to the usual files:
+
+    magic (8 bytes) | version (uint32) | header length (uint64) | header json
+    | padding | data
+
+The header holds the small tables (train_cols, unique_tags, priv_users and
+the mappers), the kind of each counter (exact table or count-min sketch)
+and, for the counter arrays and the model, the dtype, shape and offset of
+each block in the data section. Blocks start at 64 byte
+boundaries, so the counter arrays are used straight from a read only
+memory map of the file, and only the pages searched by the lookups are ever
+read from disk. The model block is the raw xgboost model (Booster.save_raw).
+A bundle of another version is refused, the Classifier then loads the
+separate files.
+"""
+
+import os
+import json
+import struct
+
+import numpy as np
+
+from encoders import counter_kinds
+
+MAGIC = b"WDVCBNDL"
+VERSION = 2
+ALIGN = 64
+prefix = struct.Struct("<8sIQ")
+
+
+def aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write_bundle(path, booster, train_cols, mappers, counters, unique_tags, priv_users):
+    blocks = []
+    size = 0
+
+    def add(data):
+        nonlocal size
+        offset = aligned(size)
+        blocks.append((offset, data))
+        size = offset + len(data)
+        return offset
+
+    arrays = {}
+    for c, counter in sorted(counters.items()):
+        for name, ar in sorted(counter.arrays().items()):
+            ar = np.ascontiguousarray(ar, dtype=ar.dtype.newbyteorder("<"))
+            arrays[c + "/" + name] = {"offset": add(ar.tobytes()), "dtype": ar.dtype.str, "shape": list(ar.shape)}
+    model = bytes(booster.save_raw())
+    header = {"version": VERSION,
+              "train_cols": list(train_cols),
+              "unique_tags": list(unique_tags),
+              "priv_users": sorted(int(u) for u in priv_users),
+              "mappers": {c: {k: int(v) for k, v in m.items()} for c, m in mappers.items()},
+              "counters": {c: counter.kind for c, counter in counters.items()},
+              "arrays": arrays,
+              "model": {"offset": add(model), "length": len(model)}}
+    header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    data_start = aligned(prefix.size + len(header))
+
+    with open(path + ".tmp", "wb") as f:
+        f.write(prefix.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for offset, data in blocks:
+            f.write(b"\0" * (data_start + offset - f.tell()))
+            f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+class Bundle(object):
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, version, header_len = prefix.unpack(f.read(prefix.size))
+            if magic != MAGIC:
+                raise ValueError(path + " is not a model bundle")
+            if version != VERSION:
+                raise ValueError("{0} is a version {1} bundle, version {2} expected".format(path, version, VERSION))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        self.data_start = aligned(prefix.size + header_len)
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+
+        self.train_cols = header["train_cols"]
+        self.unique_tags = header["unique_tags"]
+        self.priv_users = set(header["priv_users"])
+        self.mappers = header["mappers"]
+        self.counters = {}
+        for c, kind in header["counters"].items():
+            blocks = {name[len(c) + 1:]: block for name, block in header["arrays"].items()
+                      if name.startswith(c + "/")}
+            self.counters[c] = counter_kinds[kind].from_arrays({name: self.array(block)
+                                                                for name, block in blocks.items()})
+        self.model = header["model"]
+
+    def array(self, block):
+        shape = tuple(block["shape"])
+        count = int(np.prod(shape))
+        if count == 0:
+            return np.zeros(shape, dtype=block["dtype"])
+        return np.frombuffer(self.data, dtype=block["dtype"], count=count,
+                             offset=self.data_start + block["offset"]).reshape(shape)
+
+    def model_bytes(self):
+        start = self.data_start + self.model["offset"]
+        return bytearray(self.data[start:start + self.model["length"]])
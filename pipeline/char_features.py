@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:20:36 2026
+
+Character statistics of parse_tail computed over arrays of code points.
+
+Every code point gets a class (whitespace, punctuation, ...) and an alphabet
+(first word of its unicode name) in lookup tables indexed by code point.
+The tables are filled lazily, the first time a code point is seen, with the
+same per character rules parse_tail used, so the features are identical:
+the class ratios, longestCharacterSequence and main_alphabet (most frequent
+alphabet, ties to the smallest name as scipy.stats.mode did).
+"""
+
+import threading
+import unicodedata as ud
+
+import numpy as np
+
+classes = ["other", "whitespace", "punctuation", "simbol", "bracket", "upperCase", "lowerCase", "digit"]
+(OTHER, WHITESPACE, PUNCTUATION, SIMBOL, BRACKET, UPPER, LOWER, DIGIT) = range(len(classes))
+
+MAX_CODE_POINT = 0x110000
+
+
+def char_class(t):
+    if t == " ":
+        return WHITESPACE
+    elif t in ",.;:´¨'\"?¿!¡":
+        return PUNCTUATION
+    elif t in "&%$#@+-_*/\\":
+        return SIMBOL
+    elif t in "{}[]()":
+        return BRACKET
+    elif t.isupper():
+        return UPPER
+    elif t.islower():
+        return LOWER
+    elif t in "1234567890":
+        return DIGIT
+    return OTHER
+
+
+def char_alphabet(t):
+    return ud.name(t, "unknown").split(" ")[0]
+
+
+def code_points(text):
+    return np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+
+
+class CharTables(object):
+
+    def __init__(self):
+        self.classes = np.zeros(MAX_CODE_POINT, dtype=np.uint8)
+        self.alphabets = np.full(MAX_CODE_POINT, -1, dtype=np.int32)
+        self.names = []
+        self.ids = {}
+        self.lock = threading.Lock()
+
+    def alphabet_id(self, name):
+        if name not in self.ids:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+        return self.ids[name]
+
+    # Make sure every code point in cps has its class and alphabet
+    def fill(self, cps):
+        missing = cps[self.alphabets[cps] < 0]
+        if len(missing) == 0:
+            return
+        with self.lock:
+            for cp in np.unique(missing).tolist():
+                t = chr(cp)
+                self.classes[cp] = char_class(t)
+                # alphabets last, a code point with an alphabet is complete
+                self.alphabets[cp] = self.alphabet_id(char_alphabet(t))
+
+    # Position of each alphabet name in sorted order, to break mode ties
+    def name_ranks(self):
+        names = list(self.names)
+        ranks = np.empty(len(names), dtype=np.int64)
+        ranks[sorted(range(len(names)), key=names.__getitem__)] = np.arange(len(names))
+        return names, ranks
+
+
+tables = CharTables()
+
+
+def char_features_batch(tails):
+    """Character features of many tails at once, one dict per tail ({} for empty tails)"""
+    lengths = np.array([len(t) for t in tails], dtype=np.int64)
+    res = [{} for _ in tails]
+    if lengths.sum() == 0:
+        return res
+
+    cps = code_points("".join(tails))
+    tables.fill(cps)
+    names, ranks = tables.name_ranks()
+    n = len(tails)
+    owner = np.repeat(np.arange(n), lengths)
+    cls = tables.classes[cps]
+    alph = tables.alphabets[cps]
+
+    counts = np.bincount(owner * len(classes) + cls, minlength=n * len(classes)).reshape(n, len(classes))
+    latin = tables.ids.get("LATIN", -1)
+    n_latin = np.bincount(owner[alph == latin], minlength=n)
+
+    # main alphabet: most frequent, then smallest name
+    keys, key_counts = np.unique(owner * len(names) + alph, return_counts=True)
+    key_owner, key_alph = keys // len(names), keys % len(names)
+    order = np.lexsort((ranks[key_alph], -key_counts, key_owner))
+    first = order[np.r_[True, key_owner[order][1:] != key_owner[order][:-1]]]
+    main_alphabet = dict(zip(key_owner[first].tolist(), key_alph[first].tolist()))
+
+    # longest run of the same code point, runs never cross tails
+    starts = np.flatnonzero(np.r_[True, (cps[1:] != cps[:-1]) | (owner[1:] != owner[:-1])])
+    runs = np.diff(np.r_[starts, len(cps)])
+    longest = np.zeros(n, dtype=np.int64)
+    np.maximum.at(longest, owner[starts], runs)
+
+    counts, n_latin, longest, lengths = counts.tolist(), n_latin.tolist(), longest.tolist(), lengths.tolist()
+    for i in range(n):
+        tl = lengths[i]
+        if tl == 0:
+            continue
+        c = counts[i]
+        res[i] = {
+            "upperCaseRatio": c[UPPER] / tl,
+            "lowerCaseRatio": c[LOWER] / tl,
+            "simbolRatio": c[SIMBOL] / tl,
+            "alphanumericRatio": (c[LOWER] + c[DIGIT]) / tl,
+            "digitRatio": c[DIGIT] / tl,
+            "punctuationRatio": c[PUNCTUATION] / tl,
+            "bracketRatio": c[BRACKET] / tl,
+            "whitespaceRatio": c[WHITESPACE] / tl,
+            "latinRatio": n_latin[i] / tl,
+            "nonLatinRatio": (tl - n_latin[i]) / tl,
+            "main_alphabet": names[main_alphabet[i]],
+            "longestCharacterSequence": longest[i],
+        }
+    return res
+
+
+def char_features(tail):
+    """Character features of a single tail, same values as char_features_batch"""
+    tl = len(tail)
+    if tl == 0:
+        return {}
+    cps = code_points(tail)
+    tables.fill(cps)
+    c = np.bincount(tables.classes[cps], minlength=len(classes)).tolist()
+    alph = np.bincount(tables.alphabets[cps])
+    top = np.flatnonzero(alph == alph.max()).tolist()
+    names = tables.names
+    main_alphabet = min(names[a] for a in top)
+    latin = tables.ids.get("LATIN", -1)
+    n_latin = int(alph[latin]) if 0 <= latin < len(alph) else 0
+    ends = np.flatnonzero(cps[1:] != cps[:-1])
+    longest = int(np.diff(np.concatenate(([-1], ends, [tl - 1]))).max())
+    return {
+        "upperCaseRatio": c[UPPER] / tl,
+        "lowerCaseRatio": c[LOWER] / tl,
+        "simbolRatio": c[SIMBOL] / tl,
+        "alphanumericRatio": (c[LOWER] + c[DIGIT]) / tl,
+        "digitRatio": c[DIGIT] / tl,
+        "punctuationRatio": c[PUNCTUATION] / tl,
+        "bracketRatio": c[BRACKET] / tl,
+        "whitespaceRatio": c[WHITESPACE] / tl,
+        "latinRatio": n_latin / tl,
+        "nonLatinRatio": (tl - n_latin) / tl,
+        "main_alphabet": main_alphabet,
+        "longestCharacterSequence": longest,
+    }
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:45:36 2026
+
+Parity check of the features of the same revisions encoded the way they are
+for training and the way the production client encodes them.
+
+Training: the dump is parsed and written as a proc_data file, read back and
+joined with the meta csv as in 02_pre_proc.py, encoded with apply_mappings,
+written and read back as an encoded_data file and prepared as in
+03_train_model.py. Client: the meta line and revision xml messages the
+server would send go through Classifier.encode_revision and the features
+are encoded from the parsed dicts. Both matrices are compared column by
+column in train_cols order. The csv format keeps 4 significant digits of
+float features, differences within that rounding are counted apart.
+Exits with 1 when any value differs by more than that.
+"""
+########## IMPORTS ###########
+import os
+import sys
+import argparse
+import tempfile
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from classifier import Classifier
+from rev_parser import revision_generator, parse_batch
+from replay_server import stream_messages
+from data_io import extensions, FrameWriter, read_frame, write_frame
+from utils import data_dtypes, meta_dtypes
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup feature parity check')
+parser.add_argument('-dir', action = "store", dest = "dir", help = 'production directory (mappers, counters and models)', required = True)
+parser.add_argument('-file', action = "store", dest = "file", help = 'xml dump, plain or compressed', required = True)
+parser.add_argument('-meta', action = "store", dest = "meta", help = 'meta csv of the revisions of the dump', required = True)
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 10000, help = 'revisions to check')
+parser.add_argument('-format', action = "store", dest = "format", default = "csv", choices = ["csv", "parquet"], help = 'format of the intermediate files')
+parser.add_argument('-show', action = "store", dest = "show", type = int, default = 3, help = 'differing revisions shown per column')
+args = parser.parse_args()
+
+########## SCRIPT ###########
+
+clf = Classifier(args.dir)
+columns = clf.train_cols
+
+# training path
+with tempfile.TemporaryDirectory() as tmp:
+    proc_file = os.path.join(tmp, "proc" + extensions[args.format])
+    encoded_file = os.path.join(tmp, "encoded" + extensions[args.format])
+    with FrameWriter(proc_file, args.format, sorted(data_dtypes), data_dtypes) as writer:
+        writer.write(pd.DataFrame(parse_batch(list(islice(revision_generator(args.file), args.n)))))
+    data = read_frame(proc_file, args.format, dtype=data_dtypes)
+    data = data.join(pd.read_csv(args.meta, index_col="REVISION_ID", dtype=meta_dtypes), on="revisionid")
+    write_frame(clf.apply_mappings(data), encoded_file, args.format)
+    encoded = read_frame(encoded_file, args.format)
+encoded = clf.features.add_users(encoded.set_index("revisionid")).astype(np.float32).fillna(0)
+train = encoded.reindex(columns=columns, fill_value=-1)
+
+# client path
+revids, records = [], []
+for revid, meta, rev in stream_messages(args.file, args.meta, args.n):
+    case = clf.encode_revision(meta[4:].decode("utf-8"), rev[4:].decode("utf-8"))
+    if case.get("rev") is not None:
+        revids.append(case["revid"])
+        records.append(case["rev"])
+live = pd.DataFrame(clf.features.encode_records(records, columns), index=revids, columns=columns)
+
+common = train.index.intersection(live.index)
+print("{0} revisions encoded for training, {1} by the client, {2} compared".format(len(train), len(live), len(common)))
+train, live = train.loc[common].values, live.loc[common].values
+
+differ = train != live
+rounding = np.abs(train - live) <= 1e-3 * np.maximum(np.abs(train), np.abs(live)) if args.format == "csv" else np.zeros_like(differ)
+failed = False
+for j, col in enumerate(columns):
+    n_diff = differ[:, j].sum()
+    if n_diff == 0:
+        continue
+    n_real = (differ[:, j] & ~rounding[:, j]).sum()
+    failed = failed or (n_real > 0)
+    print("{0:<30} {1:>7} differ, {2:>7} beyond rounding".format(col, n_diff, n_real))
+    for i in np.flatnonzero(differ[:, j] & ~rounding[:, j])[:args.show]:
+        print("    revision {0}: training {1!r}, client {2!r}".format(common[i], train[i, j], live[i, j]))
+
+print("features differ" if failed else "features match")
+sys.exit(1 if failed else 0)
@@ -6,20 +6,27 @@ Created on Fri Dec  2 12:35:03 2016
 """
 
 import os
+import csv
 from time import time
 
 import numpy as np
 import pandas as pd
 import joblib
-from collections import defaultdict
 
 import xgboost
 
-from rev_parser import parse_xml
+from rev_parser import parse_xml, init_identifier, init_lang_cache, init_lang_subset
+from encoders import CounterTable, OnlineCounter, save_mapper, save_arrays, load_mappers, load_counters, load_priv_users
+from bundle import Bundle, write_bundle
+from session_store import SessionStore
+from features import FeatureEncoder, to_float
+from utils import id_columns
 
 class Classifier(object):
 
-    def __init__(self, working_dir):
+    def __init__(self, working_dir, lang_cache_size=2 ** 16, use_bundle=True, max_sessions=2 ** 20,
+                 max_idle_revs=0, max_idle_secs=0, sessions_file=None, online_counts=False,
+                 counts_file=None, counts_eps=1e-5, counts_delta=0.01, checkpoint_every=0):
         self.working_dir = os.path.abspath(working_dir)
         self.mappers_dir = os.path.join(self.working_dir, "mappers")
         self.counters_dir = os.path.join(self.working_dir, "counters")
@@ -30,183 +37,255 @@ class Classifier(object):
             if not os.path.exists(tdir):
                 os.makedirs(tdir)
 
-        self.mappers = {m.split(".")[0]: pd.Series.from_csv(os.path.join(self.mappers_dir, m), encoding="utf-8") for m in
-                        os.listdir(self.mappers_dir)
-                        if m.endswith(".csv")}
+        self.bundle_file = os.path.join(self.models_dir, "bundle.bin")
+        loaded = False
+        if use_bundle and os.path.exists(self.bundle_file):
+            try:
+                self.load_bundle(self.bundle_file)
+                loaded = True
+            except ValueError as e:
+                print("ignoring bundle:", e)
+        if not loaded:
+            self.load_files()
 
-        self.counters = {m.split(".")[0]: pd.Series.from_csv(os.path.join(self.counters_dir, m), encoding="utf-8") for m in
-                        os.listdir(self.counters_dir)
-                        if m.endswith(".csv")}
+        self.meta_headers = None
+        self.rolling_probs = pd.DataFrame([], columns=["sessid", "single_prob", "sess_prob"])
+        self.sessions = SessionStore(max_sessions, max_idle_revs, max_idle_secs)
+        self.sessions_file = sessions_file
+        self.checkpoint_every = checkpoint_every
+        if sessions_file and os.path.exists(sessions_file):
+            print("sessions loaded", self.sessions.load(sessions_file))
+
+        # itemid and userid counts go on from the training ones as revisions are scored
+        self.online_counts = online_counts
+        self.counts_file = counts_file
+        if online_counts:
+            for c in list(self.counters):
+                self.counters[c] = OnlineCounter(self.counters[c], counts_eps, counts_delta)
+            if counts_file and os.path.exists(counts_file):
+                try:
+                    print("online counts loaded", self.load_counts(counts_file))
+                except (OSError, ValueError, KeyError) as e:
+                    print("ignoring online counts:", e)
+
+        init_identifier()
+        if os.path.exists(os.path.join(self.models_dir, "lang_candidates.csv")):
+            with open(os.path.join(self.models_dir, "lang_candidates.csv")) as f:
+                init_lang_subset([a.strip() for a in f.readline().split(",")])
+        lang_cache_file = os.path.join(self.models_dir, "lang_cache.json")
+        self.lang_cache = init_lang_cache(lang_cache_size, lang_cache_file if os.path.exists(lang_cache_file) else None)
+
+        self.n_revs = 0
+        self.start = time()
+
+    def load_files(self):
+        self.mappers = load_mappers(self.mappers_dir)
+        self.counters = load_counters(self.counters_dir)
 
         if os.path.exists(os.path.join(self.models_dir, "model/model.pkl")):
             self.model = joblib.load(os.path.join(self.models_dir, "model/model.pkl"))
+            # booster() in the old sklearn wrapper, get_booster() since xgboost 0.7
+            self.booster = self.model.get_booster() if hasattr(self.model, "get_booster") else self.model.booster()
+        elif os.path.exists(os.path.join(self.models_dir, "model/model.json")):
+            self.booster = xgboost.Booster(model_file=os.path.join(self.models_dir, "model/model.json"))
 
         if os.path.exists(os.path.join(self.models_dir, "train_cols.csv")):
             with open(os.path.join(self.models_dir, "train_cols.csv")) as f:
                 self.train_cols = [a.strip() for a in f.readline().split(",")]
 
         if os.path.exists(os.path.join(self.models_dir, "priv_users.csv")):
-            self.priv_users = pd.read_csv(os.path.join(self.models_dir, "priv_users.csv"),
-                                          index_col="userid").index.tolist()
-
-        self.meta_headers = None
-        self.rolling_probs = pd.DataFrame([], columns=["sessid", "single_prob", "sess_prob"])
-        self.rolling_probs_2 = defaultdict(list)
+            self.priv_users = load_priv_users(os.path.join(self.models_dir, "priv_users.csv"))
+        else:
+            self.priv_users = set()
 
         if os.path.exists(os.path.join(self.mappers_dir, "unique_tags.csv")):
             with open(os.path.join(self.mappers_dir, "unique_tags.csv")) as f:
                 self.unique_tags = [a.strip() for a in f.readline().split(",")]
         else:
             self.unique_tags = []
+        self.set_features()
 
-        self.n_revs = 0
-        self.start = time()
+    def load_bundle(self, path):
+        bundle = Bundle(path)
+        self.mappers = bundle.mappers
+        self.counters = bundle.counters
+        self.booster = xgboost.Booster()
+        self.booster.load_model(bundle.model_bytes())
+        self.train_cols = bundle.train_cols
+        self.priv_users = bundle.priv_users
+        self.unique_tags = bundle.unique_tags
+        self.set_features()
+
+    def set_features(self):
+        self.features = FeatureEncoder(self.mappers, self.counters, self.unique_tags, self.priv_users)
+
+    def save_bundle(self, path=None):
+        write_bundle(path or self.bundle_file, self.booster, self.train_cols, self.mappers,
+                     self.counters, self.unique_tags, self.priv_users)
 
-    def create_mappings(self, df):
-        tipos = df.dtypes
-        for c in df.columns:
-            if tipos[c] == "object":
-                if c == "timestamp": continue
-                serie = df[c].str.lower()
-                if c == "REVISION_TAGS":
-                    self.set_unique_tags(serie)
-                vals = serie.dropna().unique().compute().values
-                if c == "afectedProperty":
-                    vals = np.asarray(list({v.split(":")[0].strip() for v in vals}))
-                mapper = pd.Series(np.arange(vals.shape[0]),
-                                   index=vals, name=c)
-                mapper.to_csv(os.path.join(self.mappers_dir, c + ".csv"), encoding="utf-8")
-                self.mappers[c] = mapper
-            elif c in ["itemid", "userid"]:
-                counter = df[c].dropna().value_counts().compute()
+    # Mappers, counters and tags from the Mappings of the training files (mappings.scan)
+    def create_mappings(self, mappings):
+        for c in mappings.values:
+            mapper = {v: i for i, v in enumerate(mappings.vocabulary(c))}
+            save_mapper(mapper, os.path.join(self.mappers_dir, c + ".json"))
+            self.mappers[c] = mapper
+        for c in mappings.counts:
+            counter = mappings.counter(c)
+            if isinstance(counter, pd.Series):
                 if -1 in counter.index:
-                    counter.ix[-1] = 1
-                self.counters[c] = counter
-                counter.to_csv(os.path.join(self.counters_dir, c + ".csv"), encoding="utf-8")
+                    counter.loc[-1] = 1
+                counter = CounterTable.from_series(counter)
+            elif c in mappings.anonymous:
+                counter.add([-1])
+            self.counters[c] = counter
+            self.counters[c].save(os.path.join(self.counters_dir, c + ".npz"))
+        if "REVISION_TAGS" in mappings.values:
+            self.set_unique_tags(list(mappings.tags))
 
     def set_unique_tags(self, tags):
-        self.unique_tags = set()
-        for t in tags.unique().compute().values:
-            if type(t) is str:
-                for tag in t.split(","):
-                    self.unique_tags.add(tag)
-        self.unique_tags = [a.strip() for a in self.unique_tags]
+        self.unique_tags = tags
+        self.set_features()
         with open(os.path.join(self.mappers_dir,
                                "unique_tags.csv"), "w") as cw:
             cw.write(",".join(self.unique_tags))
 
-    def parse_date(self, data_str):
-        try:
-            res = int(data_str.split(" ")[-1].split(":")[0].strip())
-        except:
-            res = -1
-        return res
-
+    # Encoded frame for the encoded_data files, priv_user and is_reg are added by 03_train_model.py
     def apply_mappings(self, df):
-        for c in df:
-            if c == "timestamp":
-                df["hour"] = df[c].fillna(-1).apply(lambda x: self.parse_date(x))
-                df.drop("timestamp", axis=1, inplace=True)
-            elif c in self.mappers.keys():
-                if c == "REVISION_TAGS":
-                    temp = df[c].dropna()
-                    for tag in sorted(self.unique_tags):
-                        tag_name = "TAG:" + tag
-                        idx = temp[temp.map(lambda row_tag: tag in row_tag)]
-                        idx = idx.index
-                        df[tag_name] = 0
-                        df.ix[idx, tag_name] = 1
-                        del idx
-                if c == "afectedProperty":
-                    df[c] = df[c].fillna("").astype(str).str.lower().apply(lambda x: x.split(":")[0].strip())
-                else:
-                    df[c] = df[c].fillna("").str.lower()
-                df = df.join(self.mappers[c].rename(c+"_encoded"), on=c)
-                df = df.drop(c, axis=1)
-            if c in self.counters.keys():
-                df[c] = df[c].fillna(-2)
-                df = df.join(self.counters[c].rename(c+"_freq"), on=c)
-                df[c+"_freq"] = df[c+"_freq"].fillna(0)
-        return df.fillna(-1)
-
-    def apply_mappings_dict(self, df):
-        for c in list(df.keys()):
-            if c == "timestamp":
-                df["hour"] = self.parse_date(df[c])
-            elif c in self.mappers.keys():
-                if c == "REVISION_TAGS":
-                    for tag in sorted(self.unique_tags):
-                        tag_name = "TAG:" + tag
-                        if tag in df[c]:
-                            df[tag_name] = 1
-                        else:
-                            df[tag_name] = 0
-                if c == "afectedProperty":
-                    df[c] = df[c].lower().split(":")[0].strip()
-                else:
-                    df[c] = df[c].lower()
-                df[c + "_encoded"] = self.mappers[c].get(df[c], -1)
-            if c in self.counters.keys():
-                df[c + "_freq"] = self.counters[c].get(df[c], 0)
-        return df
-
-
-    def predict_proba(self, meta_text, xml_text):
+        columns = self.features.columns(list(df.columns), users=False)
+        res = pd.DataFrame(self.features.encode(df, columns), index=df.index, columns=columns)
+        # ids are written as they are, float32 would round them
+        for c in id_columns:
+            if c in res:
+                res[c] = df[c].fillna(-2 if c in self.counters else -1).values
+        return res
 
-        self.n_revs += 1
+    def encode_revision(self, meta_text, xml_text):
         meta = meta_text.splitlines()
 
         if len(meta) > 1:
             self.meta_headers = [c.strip() for c in meta[0].strip().strip("\n").strip().split(",")]
 
         try:
-            meta = [c.strip() for c in meta[-1].strip().strip("\n").strip().split(",")]
+            meta = [c.strip() for c in next(csv.reader([meta[-1].strip()]))]
             meta = {k: v for k, v in zip(self.meta_headers, meta)}
             revid = int(meta["REVISION_ID"])
         except Exception as e:
             print("error 1")
-            return meta[-1].split(",")[0].strip(), "0.02"
-
+            return {"answer": (meta[-1].split(",")[0].strip(), "0.02")}
 
+        case = {"revid": revid, "meta": meta, "rev": None, "ok_prob": True,
+                "fallback": 0.1 if "<ip" in xml_text else 0.01}
         try:
             rev = parse_xml(xml_text.splitlines())
             for k in meta:
                 if (len(meta[k]) > 0) or (k == "REVISION_TAGS"):
                     rev[k] = meta[k]
-
-            rev = self.apply_mappings_dict(rev)
-            rev["priv_user"] = rev["userid"] in self.priv_users
-            rev["is_reg"] = rev["userid"] != -1
-            rev_ar = []
-            for k in self.train_cols:
-                val = np.float32(rev.get(k, -1))
-                if np.isfinite(val):
-                    rev_ar.append(val)
-                else:
-                    rev_ar.append(-1)
-            if rev["action_encoded"] == 0:
-                prob = -1000.0
-            else:
-                rev = xgboost.DMatrix(data=np.asarray([rev_ar]), feature_names=self.train_cols)
-                prob = self.model.booster().predict(rev, output_margin=False)[0]
-            ok_prob = True
+            case["rev"] = rev
         except Exception as e:
-            if "<ip" in xml_text:
-                prob = 0.1
-            else:
-                prob = 0.01
-            ok_prob = False
+            case["prob"], case["ok_prob"] = case["fallback"], False
             print("error 2")
+        return case
 
+    def finish_revision(self, case):
+        self.n_revs += 1
+        if "answer" in case:
+            return case["answer"]
+
+        prob = case["prob"]
         try:
-            if ok_prob:
-                sessid = int(meta["REVISION_SESSION_ID"])
-                self.rolling_probs_2[sessid].append(prob)
-                prob = np.mean(self.rolling_probs_2[sessid])
+            if case["ok_prob"]:
+                sessid = int(case["meta"]["REVISION_SESSION_ID"])
+                prob = self.sessions.add(sessid, prob, case["revid"])
         except Exception as e:
             print("error 3")
 
+        revid = case["revid"]
         if self.n_revs % 1000 == 0:
             print(str(revid), str(prob))
             print("done", self.n_revs, "in", self.start - time())
+            print("langid cache", self.lang_cache.stats())
+            print("sessions", self.sessions.stats())
+            if self.online_counts:
+                print("online counts", self.counts_stats())
+        if self.checkpoint_every and (self.n_revs % self.checkpoint_every == 0):
+            self.checkpoint()
         return str(revid), str(prob)
+
+    def save_sessions(self):
+        if self.sessions_file:
+            self.sessions.save(self.sessions_file)
+
+    def count_revisions(self, records):
+        for c, counter in self.counters.items():
+            counter.add(to_float([r.get(c, np.nan) for r in records]))
+
+    def counts_stats(self):
+        return {c: counter.total() for c, counter in sorted(self.counters.items())}
+
+    # Only the counts added online are saved, the training ones are in the counters
+    def save_counts(self):
+        if self.online_counts and self.counts_file:
+            save_arrays({c + "/" + name: ar for c, counter in self.counters.items()
+                         for name, ar in counter.arrays().items()}, self.counts_file)
+
+    # Counters without saved counts start from zero, and a snapshot that does
+    # not match the counters is not loaded at all
+    def load_counts(self, path):
+        with np.load(path) as data:
+            arrays = {k: data[k] for k in data.files}
+        previous = {c: counter.seen for c, counter in self.counters.items()}
+        try:
+            for c, counter in self.counters.items():
+                saved = {k[len(c) + 1:]: ar for k, ar in arrays.items() if k.startswith(c + "/")}
+                if saved:
+                    counter.restore(saved)
+        except (KeyError, ValueError):
+            for c, counter in self.counters.items():
+                counter.seen = previous[c]
+            raise
+        return self.counts_stats()
+
+    def checkpoint(self):
+        self.save_sessions()
+        self.save_counts()
+
+    def score_cases(self, cases):
+        # the last column is only to tell the revisions with action code 0
+        rows = self.features.encode_records([c["rev"] for c in cases], self.train_cols + ["action_encoded"])
+        scored = rows[:, -1] != 0
+        for c, keep in zip(cases, scored):
+            if not keep:
+                c["prob"] = -1000.0
+        if scored.any():
+            data = xgboost.DMatrix(data=np.ascontiguousarray(rows[scored, :-1]), feature_names=self.train_cols)
+            for c, prob in zip([c for c, keep in zip(cases, scored) if keep], self.booster.predict(data, output_margin=False)):
+                c["prob"] = prob
+
+    def predict_proba_batch(self, revisions):
+        cases = [self.encode_revision(meta_text, xml_text) for meta_text, xml_text in revisions]
+
+        to_score = [c for c in cases if c.get("rev") is not None]
+        if len(to_score) > 0:
+            if self.online_counts:
+                try:
+                    # counted before encoding, as the training counts include the revision itself
+                    self.count_revisions([c["rev"] for c in to_score])
+                except Exception as e:
+                    print("error 2 online counts", e)
+            try:
+                self.score_cases(to_score)
+            except Exception as e:
+                # scored one by one, so only the revisions that fail on their own get the fallback
+                failed = []
+                for c in to_score:
+                    try:
+                        self.score_cases([c])
+                    except Exception as e:
+                        c["prob"], c["ok_prob"] = c["fallback"], False
+                        failed.append(c["revid"])
+                print("error 2", failed)
+
+        return [self.finish_revision(c) for c in cases]
+
+    def predict_proba(self, meta_text, xml_text):
+        return self.predict_proba_batch([(meta_text, xml_text)])[0]
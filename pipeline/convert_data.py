@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 12:58:09 2026
+
+Converts existing bz2 csv outputs of proc_data and encoded_data to parquet.
+Values already rounded by '%.4g' in the csv files can not be recovered.
+"""
+########## IMPORTS ###########
+import os
+import logging
+import argparse
+
+import pandas as pd
+
+from utils import data_dtypes
+from data_io import extensions, data_files, FrameWriter
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup data format converter')
+parser.add_argument('-dir', action = "store", dest = "dir", help = 'working directory', required = True)
+parser.add_argument('-chunk', action = "store", dest = "chunk", type = int, default = 1000000, help = 'rows per chunk')
+parser.add_argument('-delete', action = "store_true", dest = "delete", help = 'delete the csv files once converted')
+args = parser.parse_args()
+
+base_path = os.path.abspath(args.dir)
+
+########## SCRIPT ###########
+
+try:
+    logging.basicConfig(filename=os.path.join(base_path, "convert_data.log"),
+                        level=logging.DEBUG, format='%(asctime)s -- %(message)s',
+                        datefmt='%m/%d/%Y %H:%M:%S')
+    logging.info("***** Starting Data Conversion *****")
+
+    for folder, dtypes in [("proc_data", data_dtypes), ("encoded_data", {})]:
+        path = os.path.join(base_path, folder)
+        if not os.path.exists(path):
+            continue
+        for f in data_files(path, "csv"):
+            source = os.path.join(path, f)
+            target = source[:-len(extensions["csv"])] + extensions["parquet"]
+            if os.path.exists(target):
+                logging.info("skipping " + source)
+                continue
+            logging.info("converting " + source)
+            try:
+                chunks = pd.read_csv(source, dtype={c: str for c in dtypes if dtypes[c] is str},
+                                     compression="bz2", chunksize=args.chunk)
+            except ValueError:
+                # EmptyDataError, not even a header
+                chunks = []
+            writer = None
+            try:
+                for chunk in chunks:
+                    if writer is None:
+                        writer = FrameWriter(target + ".tmp", "parquet", chunk.columns, dtypes)
+                    writer.write(chunk)
+            finally:
+                if writer is not None:
+                    writer.close()
+            if writer is None:
+                # no rows, so no columns to write a parquet file with
+                logging.info("skipping empty " + source)
+                continue
+            os.replace(target + ".tmp", target)
+            logging.info("done {0} rows".format(writer.rows))
+            if args.delete:
+                os.remove(source)
+except Exception as e:
+    logging.exception("***** An error ocurred *****")
+finally:
+    logging.info("***** Finished *****")
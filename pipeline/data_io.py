@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 12:20:41 2026
+
+Reading and writing of the proc_data and encoded_data files, either as bz2
+compressed csv (the original format) or as typed, snappy compressed parquet.
+"""
+
+import os
+import bz2
+
+import numpy as np
+import pandas as pd
+
+from utils import id_columns
+
+extensions = {"csv": ".bz2", "parquet": ".parquet"}
+
+
+def data_files(path, fmt):
+    return sorted([f for f in os.listdir(path) if f.endswith(extensions[fmt])])
+
+
+def column_type(col, dtypes):
+    if col in id_columns:
+        return np.int64
+    return dtypes.get(col, np.float32)
+
+
+def typed_frame(df, dtypes):
+    for c in df.columns:
+        tipo = column_type(c, dtypes)
+        if tipo is str:
+            df[c] = df[c].astype(object).where(df[c].notnull(), None)
+        elif c in id_columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(-1).astype(np.int64)
+        else:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype(tipo)
+    return df
+
+
+def arrow_schema(columns, dtypes):
+    import pyarrow as pa
+    arrow_types = {str: pa.string(), np.int64: pa.int64(), int: pa.int64(),
+                   np.float32: pa.float32(), np.float64: pa.float64()}
+    return pa.schema([(c, arrow_types[column_type(c, dtypes)]) for c in columns])
+
+
+class FrameWriter(object):
+
+    def __init__(self, path, fmt, columns, dtypes=None):
+        self.path = path
+        self.fmt = fmt
+        self.columns = list(columns)
+        self.dtypes = dtypes or {}
+        self.rows = 0
+        self.header = True
+        if fmt == "csv":
+            self.f = bz2.open(path, "wt", encoding="utf-8", newline="")
+        else:
+            import pyarrow.parquet as pq
+            self.schema = arrow_schema(self.columns, self.dtypes)
+            self.f = pq.ParquetWriter(path, self.schema, compression="snappy")
+
+    def write(self, df):
+        df = df.reindex(columns=self.columns)
+        if self.fmt == "csv":
+            df.to_csv(self.f, header=self.header, index=False, float_format='%.4g')
+            self.header = False
+        else:
+            import pyarrow as pa
+            df = typed_frame(df, self.dtypes)
+            self.f.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+        self.rows += len(df)
+
+    def close(self):
+        if self.fmt == "csv" and self.header:
+            pd.DataFrame([], columns=self.columns).to_csv(self.f, index=False)
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_frame(df, path, fmt, dtypes=None):
+    with FrameWriter(path, fmt, df.columns, dtypes) as writer:
+        writer.write(df)
+
+
+def read_frame(path, fmt, dtype=None, columns=None):
+    if fmt == "csv":
+        return pd.read_csv(path, dtype=dtype, usecols=columns, compression="bz2")
+    return pd.read_parquet(path, columns=columns)
+
+
+def read_dask(paths, fmt, dtype=None, columns=None):
+    from dask import dataframe as dd
+    if fmt == "csv":
+        return dd.concat([dd.read_csv(urlpath=p, dtype=dtype, usecols=columns,
+                                      compression="bz2", blocksize=None)
+                          for p in paths])
+    return dd.read_parquet(paths, columns=columns)
+
+
+def iter_frames(path, fmt, chunksize, dtype=None, columns=None):
+    if fmt == "csv":
+        for chunk in pd.read_csv(path, dtype=dtype, usecols=columns,
+                                 compression="bz2", chunksize=chunksize):
+            yield chunk
+    else:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
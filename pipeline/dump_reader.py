@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:02:15 2026
+
+Opens xml dumps as binary streams, decompressing on the fly so that the
+uncompressed xml never has to be written to disk.
+"""
+
+import os
+import bz2
+import gzip
+import subprocess
+from contextlib import contextmanager
+
+
+class SevenZipStream(object):
+
+    def __init__(self, path, exe="7za"):
+        self.path = path
+        self.eof = False
+        self.proc = subprocess.Popen([exe, "e", "-so", path], stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, bufsize=-1)
+
+    def read(self, size=-1):
+        data = self.proc.stdout.read(size)
+        if not data and size != 0:
+            self.eof = True
+        return data
+
+    def close(self):
+        if not self.eof:
+            # stopped before the end of the archive, nothing to check
+            self.proc.kill()
+        self.proc.stdout.close()
+        code = self.proc.wait()
+        if self.eof and code != 0:
+            raise Exception("7za failed with exit code {0} on {1}".format(code, self.path))
+
+
+decompressors = {
+    ".7z": SevenZipStream,
+    ".bz2": lambda path: bz2.open(path, "rb"),
+    ".gz": lambda path: gzip.open(path, "rb"),
+    ".xml": lambda path: open(path, "rb"),
+}
+
+
+@contextmanager
+def open_dump(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in decompressors:
+        raise Exception("No decompressor registered for " + path)
+    f = decompressors[ext](path)
+    try:
+        yield f
+    finally:
+        f.close()
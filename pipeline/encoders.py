@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:12:33 2026
+
+Lookup tables used to encode revisions.
+
+Mappers (category -> code) are plain dicts saved as json, counters (id ->
+number of revisions, millions of userids and itemids) are a sorted array of
+ids and an array of counts saved as npz and searched with searchsorted, and
+the privileged users are a set. The csv files written by older versions of
+the pipeline are still read. A count-min sketch can replace the exact
+counts, in a fixed amount of memory set by its error bound, and an
+OnlineCounter adds to a counter of either kind the ids seen by the client.
+"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def save_mapper(mapper, path):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(mapper, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def load_mapper(path):
+    if path.endswith(".csv"):
+        return pd.Series.from_csv(path, encoding="utf-8").to_dict()
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class CounterTable(object):
+
+    kind = "table"
+
+    def __init__(self, keys, counts, presorted=False):
+        if presorted:
+            # already sorted int64 arrays (memory mapped from a bundle), used as they are
+            self.keys, self.counts = keys, counts
+            return
+        keys = np.asarray(keys).astype(np.int64)
+        order = np.argsort(keys, kind="mergesort")
+        self.keys = keys[order]
+        self.counts = np.asarray(counts).astype(np.int64)[order]
+
+    @classmethod
+    def from_series(cls, counter):
+        return cls(counter.index.values, counter.values)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, key, default=0):
+        """Count of one id, like Series.get"""
+        try:
+            pos = int(np.searchsorted(self.keys, key))
+        except (TypeError, ValueError):
+            return default
+        if (pos < len(self.keys)) and (self.keys[pos] == key):
+            return self.counts[pos]
+        return default
+
+    def lookup(self, keys, default=0):
+        """Counts of an array of ids, default where missing (or nan)"""
+        keys = np.asarray(keys, dtype=np.float64)
+        res = np.full(len(keys), default, dtype=np.int64)
+        if len(self.keys) == 0:
+            return res
+        pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[pos] == keys
+        res[found] = self.counts[pos[found]]
+        return res
+
+    def nbytes(self):
+        return self.keys.nbytes + self.counts.nbytes
+
+    def arrays(self):
+        return {"keys": self.keys, "counts": self.counts}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Inverse of arrays, the keys are already sorted"""
+        return cls(arrays["keys"], arrays["counts"], presorted=True)
+
+    def save(self, path):
+        save_arrays(self.arrays(), path)
+
+    @classmethod
+    def load(cls, path):
+        if path.endswith(".csv"):
+            return cls.from_series(pd.Series.from_csv(path, encoding="utf-8"))
+        return load_counter(path)
+
+
+class CountMinSketch(object):
+    """Approximate counts of ids in a depth x width table. A count is never
+    under the true one, and is over it by more than eps times the total of
+    the counts with probability at most delta. Sketches with the same hashes
+    merge by adding their tables."""
+
+    kind = "sketch"
+
+    def __init__(self, table, a, b):
+        self.table, self.a, self.b = table, a, b
+        self.shift = np.uint64(64 - int(np.log2(table.shape[1])))
+
+    @classmethod
+    def from_error(cls, eps, delta, seed=0):
+        width = 2 ** max(1, int(np.ceil(np.log2(np.e / eps))))
+        depth = max(1, int(np.ceil(np.log(1 / delta))))
+        # multiply-add-shift hashes, the same for a given seed
+        rng = np.random.RandomState(seed)
+        a = np.frombuffer(rng.bytes(8 * depth), dtype=np.uint64) | np.uint64(1)
+        b = np.frombuffer(rng.bytes(8 * depth), dtype=np.uint64).copy()
+        return cls(np.zeros((depth, width), dtype=np.uint32), a, b)
+
+    def cells(self, keys):
+        x = keys.astype(np.int64).view(np.uint64)
+        return ((self.a[:, None] * x[None, :] + self.b[:, None]) >> self.shift).astype(np.intp)
+
+    def add(self, keys, counts=None):
+        keys = np.asarray(keys, dtype=np.float64)
+        keep = ~np.isnan(keys)
+        counts = np.ones(keep.sum()) if counts is None else np.asarray(counts, dtype=np.float64)[keep]
+        width = self.table.shape[1]
+        for row, cells in zip(self.table, self.cells(keys[keep])):
+            row += np.bincount(cells, weights=counts, minlength=width).astype(np.uint32)
+        return self
+
+    def merge(self, other):
+        if (self.table.shape != other.table.shape) or (self.a != other.a).any() or (self.b != other.b).any():
+            raise ValueError("only sketches with the same size and hashes can be merged")
+        self.table += other.table
+        return self
+
+    def get(self, key, default=0):
+        try:
+            return self.lookup([key], default)[0]
+        except (TypeError, ValueError):
+            return default
+
+    def lookup(self, keys, default=0):
+        """Estimated counts of an array of ids, default for nan"""
+        keys = np.asarray(keys, dtype=np.float64)
+        res = np.full(len(keys), default, dtype=np.int64)
+        keep = ~np.isnan(keys)
+        cells = self.cells(keys[keep])
+        res[keep] = np.min([row[c] for row, c in zip(self.table, cells)], axis=0) if len(cells[0]) else []
+        return res
+
+    def total(self):
+        """Sum of the counts added"""
+        return int(self.table[0].sum())
+
+    def nbytes(self):
+        return self.table.nbytes
+
+    def arrays(self):
+        return {"table": self.table, "a": self.a, "b": self.b}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["table"], arrays["a"], arrays["b"])
+
+    def save(self, path):
+        save_arrays(self.arrays(), path)
+
+
+class OnlineCounter(object):
+    """Counts of the training counter base plus those of the ids added since,
+    kept in a CountMinSketch so memory stays fixed however long the stream.
+    Missing and negative ids (-1, anonymous users) are not counted, like in
+    Classifier.create_mappings."""
+
+    def __init__(self, base, eps=1e-5, delta=0.01):
+        self.base = base
+        self.seen = CountMinSketch.from_error(eps, delta)
+
+    def add(self, keys):
+        keys = np.asarray(keys, dtype=np.float64)
+        self.seen.add(keys[keys >= 0])
+        return self
+
+    def get(self, key, default=0):
+        try:
+            return self.lookup([key], default)[0]
+        except (TypeError, ValueError):
+            return default
+
+    def lookup(self, keys, default=0):
+        return self.base.lookup(keys, default) + self.seen.lookup(keys)
+
+    def total(self):
+        return self.seen.total()
+
+    def nbytes(self):
+        return self.base.nbytes() + self.seen.nbytes()
+
+    def arrays(self):
+        """Arrays of the counts added, the base is not saved"""
+        return self.seen.arrays()
+
+    def restore(self, arrays):
+        missing = [name for name in self.seen.arrays() if name not in arrays]
+        if missing:
+            raise ValueError("saved counts without " + ", ".join(missing))
+        seen = CountMinSketch.from_arrays(arrays)
+        if seen.table.shape != self.seen.table.shape:
+            raise ValueError("saved counts of another size, {0} instead of {1}".format(seen.table.shape, self.seen.table.shape))
+        self.seen = seen
+        return self
+
+
+counter_kinds = {cls.kind: cls for cls in [CounterTable, CountMinSketch]}
+
+
+def save_arrays(arrays, path):
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(path + ".tmp", path)
+
+
+def load_counter(path):
+    if path.endswith(".csv"):
+        return CounterTable.load(path)
+    with np.load(path) as data:
+        arrays = {k: data[k] for k in data.files}
+    if "table" in arrays:
+        return CountMinSketch.from_arrays(arrays)
+    return CounterTable(arrays["keys"], arrays["counts"])
+
+
+# Encoders of a directory by column name, json/npz preferred over old csv files
+def load_tables(path, extension, loader):
+    tables = {}
+    files = sorted(os.listdir(path)) if os.path.exists(path) else []
+    for name in files:
+        col, ext = os.path.splitext(name)
+        if (ext == extension) or ((ext == ".csv") and (col + extension not in files) and (col != "unique_tags")):
+            tables[col] = loader(os.path.join(path, name))
+    return tables
+
+
+def load_mappers(path):
+    return load_tables(path, ".json", load_mapper)
+
+
+def load_counters(path):
+    return load_tables(path, ".npz", load_counter)
+
+
+def load_priv_users(path):
+    return set(pd.read_csv(path, index_col="userid").index.tolist())
+
+
+class TagEncoder(object):
+    """TAG:<tag> indicators of the REVISION_TAGS column, 1 when the tag is a
+    substring of the raw (not lowercased) value, like the original encoding.
+    Each distinct value is tested once, rows just index the result."""
+
+    def __init__(self, tags, maxsize=2 ** 16):
+        self.tags = sorted(set(tags))
+        self.columns = ["TAG:" + t for t in self.tags]
+        self.maxsize = maxsize
+        self.rows = {}
+
+    def encode_value(self, value):
+        row = self.rows.get(value)
+        if row is None:
+            if isinstance(value, str):
+                row = tuple(1 if tag in value else 0 for tag in self.tags)
+            else:
+                row = (0,) * len(self.tags)
+            if len(self.rows) >= self.maxsize:
+                self.rows.clear()
+            self.rows[value] = row
+        return row
+
+    def encode(self, values):
+        """uint8 matrix with a row per value and a column per tag, zeros for nan"""
+        codes, uniques = pd.factorize(values)
+        table = np.zeros((len(uniques) + 1, len(self.tags)), dtype=np.uint8)
+        for i, value in enumerate(uniques):
+            table[i] = self.encode_value(value)
+        # code -1 (nan) takes the last row of zeros
+        return table[codes]
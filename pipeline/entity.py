@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:52:10 2026
+
+Lazy access to the fields parse_revision needs from the item json.
+
+Item json is often hundreds of KB, but only the id, the first P31 claim and,
+for label and sitelink edits, the labels or sitelinks maps are used. Entity
+reads the id with an anchored regex on the start of the text and decodes
+only the P31 main snak or the requested map with raw_decode from where its
+key is. Whenever the text does not look as expected it falls back to
+decoding the whole document (with orjson when it is installed), so the
+values are the same as with json.loads. Short documents are just decoded
+whole. Malformed json only fails when a field has to come from the full
+decode.
+"""
+
+import re
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+decoder = json.JSONDecoder()
+
+id_regex = re.compile(r'\s*\{\s*(?:"type"\s*:\s*"[^"\\]*"\s*,\s*)?"id"\s*:\s*"([^"\\]*)"')
+p31_regex = re.compile(r'"P31"\s*:\s*\[\s*\{\s*"mainsnak"\s*:\s*')
+# quotes inside json strings are escaped, so these only match keys
+map_regex = {k: re.compile(r'"%s"\s*:\s*' % k) for k in ["labels", "sitelinks"]}
+
+
+def loads(text):
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except ValueError:
+            # lone surrogates, huge ints... that json accepts
+            pass
+    return json.loads(text)
+
+
+class Entity(object):
+
+    def __init__(self, text, small=4096):
+        self.text = text
+        self.full = None
+        self.fields = {}
+        # short documents decode faster in one go than field by field
+        if len(text) < small:
+            self.decoded()
+
+    def __len__(self):
+        return len(self.text)
+
+    def decoded(self):
+        if self.full is None:
+            self.full = loads(self.text)
+        return self.full
+
+    def item_id(self):
+        """Same as json.loads(text).get("id", "-1")"""
+        if self.full is None:
+            match = id_regex.match(self.text)
+            if match:
+                return match.group(1)
+        return self.decoded().get("id", "-1")
+
+    def instance_of(self):
+        """numeric-id of claims.P31[0], None when missing"""
+        if self.full is None:
+            if '"P31"' not in self.text:
+                return None
+            match = p31_regex.search(self.text)
+            if match:
+                try:
+                    snak = decoder.raw_decode(self.text, match.end())[0]
+                    return snak["datavalue"]["value"]["numeric-id"]
+                except:
+                    return None
+        try:
+            return self.decoded()["claims"]["P31"][0]["mainsnak"]["datavalue"]["value"]["numeric-id"]
+        except:
+            return None
+
+    def get(self, key, default=None):
+        """dict.get over the top level of the item, labels and sitelinks are
+        decoded on their own"""
+        if (self.full is None) and (key in map_regex):
+            if key in self.fields:
+                return self.fields[key]
+            match = map_regex[key].search(self.text)
+            if match:
+                try:
+                    self.fields[key] = decoder.raw_decode(self.text, match.end())[0]
+                    return self.fields[key]
+                except ValueError:
+                    pass
+        return self.decoded().get(key, default)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:40:51 2026
+
+AUC on the 2016_03 validation month with the exact itemid and userid
+counters of the production folder and with count-min sketches of them, for
+each error bound given.
+
+The sketches are built from the exact counts, which gives the same tables
+as 02_pre_proc.py -counters sketch with the same eps and delta, and the
+revisions are encoded with FeatureEncoder the way the client encodes them.
+The model is the one trained on the exact counts, so this is the effect of
+the sketch error on its *_freq features at prediction time. Revisions with
+action code 0 (answered -1000 by the client) are left out. The session AUC
+is the one of the running mean of the session probabilities the client
+sends.
+"""
+########## IMPORTS ###########
+import os
+import argparse
+from timeit import default_timer as timer
+
+import numpy as np
+import pandas as pd
+import xgboost
+from sklearn.metrics import roc_auc_score
+
+from classifier import Classifier
+from features import FeatureEncoder
+from encoders import CountMinSketch
+from data_io import extensions, read_frame
+from utils import data_dtypes, meta_dtypes
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup sketched counters evaluation')
+parser.add_argument('-dir', action = "store", dest = "dir", help = 'working directory', required = True)
+parser.add_argument('-format', action = "store", dest = "format", default = "csv", choices = ["csv", "parquet"], help = 'format of the proc_data files')
+parser.add_argument('-eps', action = "store", dest = "eps", default = "1e-4,1e-5,1e-6", help = 'comma separated sketch errors, as a fraction of the total count')
+parser.add_argument('-delta', action = "store", dest = "delta", type = float, default = 0.01, help = 'probability of a sketch count above the error')
+args = parser.parse_args()
+
+base_path = os.path.abspath(args.dir)
+valid_name = "wdvc16_2016_03"
+
+########## SCRIPT ###########
+
+clf = Classifier(os.path.join(base_path, "production"))
+if any(counter.kind != "table" for counter in clf.counters.values()):
+    raise Exception("the production counters must be exact, run 02_pre_proc.py with -counters exact")
+
+start = timer()
+data = read_frame(os.path.join(base_path, "proc_data", valid_name + extensions[args.format]), args.format, dtype=data_dtypes)
+meta = pd.read_csv(os.path.join(base_path, "meta", valid_name + "_meta.csv"), index_col="REVISION_ID", dtype=meta_dtypes)
+data = data.join(meta, on="revisionid").sort_values("revisionid")
+truth = pd.read_csv(os.path.join(base_path, "truth", valid_name + "_truth.csv"), index_col="REVISION_ID")
+data = data[data.revisionid.isin(truth.index)]
+labels = (truth["ROLLBACK_REVERTED"].reindex(data.revisionid.values) == "T").values
+print("{0} revisions of {1} read in {2:.1f}s".format(len(data), valid_name, timer() - start))
+
+counter_sets = [("exact", clf.counters)]
+for eps in [float(e) for e in args.eps.split(",")]:
+    counter_sets.append(("sketch eps={0:g}".format(eps),
+                         {c: CountMinSketch.from_error(eps, args.delta).add(counter.keys, counter.counts)
+                          for c, counter in clf.counters.items()}))
+
+columns = clf.train_cols + ["action_encoded"]
+exact_freqs = None
+print("{0:<18} {1:>9} {2:>9} {3:>11}  {4}".format("counters", "AUC", "session", "memory MB", "freq error per revision (mean / share / max)"))
+for name, counters in counter_sets:
+    start = timer()
+    features = FeatureEncoder(clf.mappers, counters, clf.unique_tags, clf.priv_users)
+    rows = features.encode(data, columns)
+    scored = rows[:, -1] != 0
+    probs = clf.booster.predict(xgboost.DMatrix(data=np.ascontiguousarray(rows[scored, :-1]), feature_names=clf.train_cols))
+    sessions = pd.Series(probs).groupby(data.REVISION_SESSION_ID.values[scored])
+    session_probs = (sessions.cumsum() / (sessions.cumcount() + 1)).values
+
+    freqs = features.encode(data, [c + "_freq" for c in sorted(counters)])
+    if exact_freqs is None:
+        exact_freqs = freqs
+    errors = []
+    for j, c in enumerate(sorted(counters)):
+        error = freqs[:, j] - exact_freqs[:, j]
+        errors.append("{0} {1:.2f} / {2:.4f} / {3:.0f}".format(c, error.mean(), (error != 0).mean(), error.max()))
+    memory = sum(counter.nbytes() for counter in counters.values()) / 2 ** 20
+    print("{0:<18} {1:>9.5f} {2:>9.5f} {3:>11.1f}  {4}  ({5:.1f}s)".format(
+        name, roc_auc_score(labels[scored], probs), roc_auc_score(labels[scored], session_probs),
+        memory, ", ".join(errors), timer() - start))
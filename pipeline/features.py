@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:20:05 2026
+
+Encoding of parsed revisions into model features, shared by the encoded_data
+files (02_pre_proc.py), the training matrix (03_train_model.py) and the
+production client.
+
+A batch is either a DataFrame (proc_data joined with the meta) or a list of
+dicts (parsed revision plus meta, in the client), of any number of rows, and
+the result a float32 matrix with the requested columns in order. Every
+column is encoded the same way whatever the input:
+
+- hour: from timestamp, -1 when missing or not parseable
+- <col>_encoded: code of the lowercased value (afectedProperty up to the
+  first ":") in the mapper of the column, missing read as "", -1 when not
+  in the mapper
+- TAG:<tag>: TagEncoder of REVISION_TAGS, 0 when missing
+- counted ids (itemid, userid): the id, -2 when missing, and <col>_freq,
+  its count, 0 when not counted
+- priv_user, is_reg: from userid
+- anything else: the number, -1 when missing
+
+Non finite values, and columns whose input is not in the batch, are -1.
+Each distinct category or tag value is encoded once per batch.
+"""
+
+import numpy as np
+import pandas as pd
+
+from encoders import TagEncoder
+
+
+def parse_hour(timestamp):
+    try:
+        return int(timestamp.split(" ")[-1].split(":")[0].strip())
+    except:
+        return -1
+
+
+def as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def to_float(values):
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([as_float(v) for v in values], dtype=np.float64)
+
+
+def normalize(col, value):
+    if col == "afectedProperty":
+        return str(value).lower().split(":")[0].strip()
+    if isinstance(value, str):
+        return value.lower()
+    return None
+
+
+class FeatureEncoder(object):
+
+    def __init__(self, mappers=None, counters=None, tags=(), priv_users=()):
+        # the dicts are shared with the Classifier, create_mappings fills them in place
+        self.mappers = mappers if mappers is not None else {}
+        self.counters = counters if counters is not None else {}
+        self.tags = TagEncoder(tags)
+        self.tag_index = {c: i for i, c in enumerate(self.tags.columns)}
+        self.priv_users = np.array(sorted(priv_users), dtype=np.float64)
+
+    def columns(self, input_columns, users=True):
+        """Features of a batch with these columns, in the order of the
+        encoded_data files: the columns encoded as numbers where they are,
+        then the columns derived from the others"""
+        kept, added = [], []
+        for c in input_columns:
+            if c == "timestamp":
+                added.append("hour")
+            elif c in self.mappers:
+                if c == "REVISION_TAGS":
+                    added.extend(self.tags.columns)
+                added.append(c + "_encoded")
+            else:
+                kept.append(c)
+            if c in self.counters:
+                added.append(c + "_freq")
+        if users:
+            added.extend(["priv_user", "is_reg"])
+        return kept + added
+
+    def source(self, col):
+        """Input column a feature comes from and how it is encoded"""
+        if col == "hour":
+            return "timestamp", "hour"
+        if col in ["priv_user", "is_reg"]:
+            return "userid", col
+        if col.startswith("TAG:"):
+            return "REVISION_TAGS", "tag"
+        if col.endswith("_encoded") and (col[:-len("_encoded")] in self.mappers):
+            return col[:-len("_encoded")], "encoded"
+        if col.endswith("_freq") and (col[:-len("_freq")] in self.counters):
+            return col[:-len("_freq")], "freq"
+        if col in self.counters:
+            return col, "id"
+        return col, "number"
+
+    def encode_category(self, col, values):
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        mapper = self.mappers[col]
+        table = np.empty(len(uniques) + 1, dtype=np.float64)
+        for i, value in enumerate(uniques):
+            table[i] = mapper.get(normalize(col, value), -1)
+        # code -1 (missing) takes the last entry
+        table[-1] = mapper.get(normalize(col, ""), -1)
+        return table[codes]
+
+    def encode(self, batch, columns=None, n=None):
+        """float32 matrix of the columns (all of them by default) for a
+        DataFrame or a dict of column -> values"""
+        if columns is None:
+            columns = self.columns(list(batch.keys()))
+        if n is None:
+            n = len(batch.index) if isinstance(batch, pd.DataFrame) else len(next(iter(batch.values()), ()))
+        res = np.full((n, len(columns)), -1, dtype=np.float32)
+        ids, tags = {}, None
+        for j, col in enumerate(columns):
+            src, kind = self.source(col)
+            if src not in batch:
+                continue
+            values = batch[src]
+            if kind == "number":
+                res[:, j] = to_float(values)
+            elif kind == "encoded":
+                res[:, j] = self.encode_category(src, values)
+            elif kind == "hour":
+                res[:, j] = [parse_hour(v) for v in values]
+            elif kind == "tag":
+                if col not in self.tag_index:
+                    continue
+                if tags is None:
+                    tags = self.tags.encode(np.asarray(values, dtype=object))
+                res[:, j] = tags[:, self.tag_index[col]]
+            else:
+                if src not in ids:
+                    ids[src] = np.array(to_float(values))
+                    ids[src][np.isnan(ids[src])] = -2
+                if kind == "id":
+                    res[:, j] = ids[src]
+                elif kind == "freq":
+                    res[:, j] = self.counters[src].lookup(ids[src], 0)
+                elif kind == "priv_user":
+                    res[:, j] = np.isin(ids[src], self.priv_users)
+                elif kind == "is_reg":
+                    res[:, j] = ids[src] != -1
+        res[~np.isfinite(res)] = -1
+        return res
+
+    def add_users(self, df):
+        """priv_user and is_reg columns of an encoded_data frame"""
+        users = self.encode(df, ["priv_user", "is_reg"])
+        df["priv_user"], df["is_reg"] = users[:, 0], users[:, 1]
+        return df
+
+    def encode_records(self, records, columns):
+        """encode for a list of dicts, a missing key is a missing value (not a
+        missing column, so a row does not depend on the rest of the batch)"""
+        inputs = {self.source(col)[0] for col in columns}
+        batch = {src: [r.get(src, np.nan) for r in records] for src in inputs}
+        return self.encode(batch, columns, len(records))
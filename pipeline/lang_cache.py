@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:35:49 2026
+
+Bounded LRU cache in front of the langid classifier.
+
+Bots push the same labels, aliases and titles thousands of times, so most
+tails reaching lang_probs have been classified before. The cache is keyed
+by the exact tail (and the claimed language when langid is restricted to a
+few candidates): langid works on the raw utf8 bytes, so any normalization
+could change the answer. It can be saved to a json file and loaded by a
+later run, the Classifier loads it from its working directory. A file saved
+with another signature (the langid candidates) is not loaded.
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+
+class LangCache(object):
+
+    def __init__(self, classify, maxsize=2 ** 16, signature=None):
+        self.classify = classify
+        self.maxsize = maxsize
+        self.signature = signature
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            res = self.entries.get(key)
+            if res is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return res
+            self.misses += 1
+        res = self.classify(key)
+        if self.maxsize > 0:
+            with self.lock:
+                self.put(key, res)
+        return res
+
+    def put(self, key, res):
+        self.entries[key] = res
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / total if total else 0.0}
+
+    # Entries are stored least recently used first, so loading keeps the order
+    def save(self, path):
+        with self.lock:
+            entries = [[key, lang, prob] for key, (lang, prob) in self.entries.items()]
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"signature": self.signature, "entries": entries}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    # An unreadable file, or a bare list of entries saved without a signature
+    # by older versions, is ignored like a file of another signature
+    def load(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if (not isinstance(saved, dict)) or (saved.get("signature") != self.signature):
+                return 0
+            entries = [(tuple(key) if isinstance(key, list) else key, (lang, prob))
+                       for key, lang, prob in saved["entries"]]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print("ignoring lang cache:", path, e)
+            return 0
+        with self.lock:
+            for key, value in entries[-self.maxsize:] if self.maxsize > 0 else []:
+                self.put(key, value)
+        return len(entries)
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:26:15 2026
+
+langid restricted to a few candidate languages.
+
+lang_probs only needs to know whether the claimed language of a label wins
+and by how much. SubsetIdentifier scores just the claimed language and a
+fixed candidate set: the naive bayes log-probabilities are summed over the
+nonzero features of the text only, and normalized over that subset, so the
+dense product with the whole feature x language matrix and the normalization
+over every language are skipped. The probabilities are relative to the
+subset, not the same as the full model.
+"""
+
+import numpy as np
+
+
+class SubsetIdentifier(object):
+
+    def __init__(self, identifier, candidates):
+        if len(candidates) == 0:
+            raise ValueError("No candidate languages")
+        self.identifier = identifier
+        self.classes = list(identifier.nb_classes)
+        self.index = {c: i for i, c in enumerate(self.classes)}
+        for lang in candidates:
+            if lang not in self.index:
+                raise ValueError("Unknown language code %s" % lang)
+        self.langs = list(candidates)
+        self.candidates = [self.index[lang] for lang in candidates]
+
+    def languages(self, lang):
+        i = self.index.get(lang)
+        if (i is None) or (i in self.candidates):
+            return self.candidates
+        return self.candidates + [i]
+
+    def classify(self, text, lang):
+        """Most probable language among the candidates and lang, and its probability within them"""
+        idx = self.languages(lang)
+        fv = self.identifier.instance2fv(text)
+        nz = np.flatnonzero(fv)
+        pd = np.dot(fv[nz], self.identifier.nb_ptc[np.ix_(nz, idx)]) + self.identifier.nb_pc[idx]
+        probs = self.identifier.norm_probs(pd)
+        cl = np.argmax(probs)
+        return str(self.classes[idx[cl]]), float(probs[cl])
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:30:04 2026
+
+Word lists used by parse_tail, compiled once at import into hash sets.
+
+The language name regex of rev_parser only has optional parts (no * or +),
+so it matches a finite set of strings. Lexicon expands it into a frozenset
+that answers for ascii words, which are the vast majority, with one hash
+lookup. Other words go through the original regex, memoized per word, so
+the result is always the same as running the regex.
+"""
+
+import re
+from functools import lru_cache
+from itertools import product
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+def is_ascii(word):
+    try:
+        word.encode("ascii")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+if hasattr(str, "isascii"):
+    is_ascii = str.isascii
+
+
+def char_set(items):
+    chars = set()
+    for op, av in items:
+        op = str(op)
+        if op == "LITERAL":
+            chars.add(chr(av))
+        elif op == "RANGE":
+            chars.update(chr(c) for c in range(av[0], av[1] + 1))
+        else:
+            raise ValueError("Can not expand " + op)
+    return chars
+
+
+def expand(pattern):
+    strings = {""}
+    for op, av in pattern:
+        op = str(op)
+        if op == "LITERAL":
+            options = {chr(av)}
+        elif op == "IN":
+            options = char_set(av)
+        elif op == "AT":
+            # anchors around the whole word, they match the empty string
+            options = {""}
+        elif op == "SUBPATTERN":
+            options = expand(av[-1])
+        elif op == "BRANCH":
+            options = set()
+            for branch in av[1]:
+                options |= expand(branch)
+        elif op in ("MAX_REPEAT", "MIN_REPEAT"):
+            low, high, sub = av
+            if high > 4:
+                raise ValueError("Can not expand unbounded repeats")
+            sub = expand(sub)
+            options = set()
+            for n in range(low, high + 1):
+                options |= {"".join(p) for p in product(sub, repeat=n)}
+        else:
+            raise ValueError("Can not expand " + op)
+        strings = {s + o for s in strings for o in options}
+    return strings
+
+
+# Membership is meant for single \w+ tokens, as parse_tail produces them
+class Lexicon(object):
+
+    def __init__(self, words=(), regex=None):
+        self.regex = regex
+        if regex is None:
+            self.words = frozenset(words)
+        else:
+            expanded = expand(sre_parse.parse(regex.pattern, regex.flags))
+            chars = {c for s in expanded for c in s if not is_ascii(c)}
+            letters = "abcdefghijklmnopqrstuvwxyz"
+            if any(re.match(re.escape(c), l, regex.flags) for c in chars for l in letters + letters.upper()):
+                raise ValueError("Non ascii characters in the regex match ascii ones")
+            self.words = frozenset(s.lower() for s in expanded if is_ascii(s) and re.match(r"\w+\Z", s))
+            self.search = lru_cache(maxsize=2 ** 16)(lambda word: regex.search(word) is not None)
+
+    def __contains__(self, word):
+        if (self.regex is None) or is_ascii(word):
+            return word.lower() in self.words
+        return self.search(word)
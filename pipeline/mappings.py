@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 19:30:12 2026
+
+Vocabularies, tags and id counts for Classifier.create_mappings, collected
+in a single streaming pass over the training files.
+
+Each file is read once, in chunks, by scan_file, which returns a Mappings
+with the lowercased values of the categorical columns (in order of first
+appearance), the REVISION_TAGS tags and the counts of the counted id
+columns. Mappings of different files merge into one, so files are scanned
+in parallel and merged in the order they were given, which keeps the
+codes the same whatever the number of workers. With sketch=(eps, delta)
+the ids are counted in a CountMinSketch of that error bound instead, whose
+memory does not grow with the number of distinct ids.
+"""
+
+from collections import OrderedDict
+from timeit import default_timer as timer
+
+import pandas as pd
+from joblib import Parallel, delayed
+
+from encoders import CountMinSketch
+
+
+class Mappings(object):
+
+    def __init__(self, sketch=None):
+        self.values = OrderedDict() # column -> OrderedDict of values
+        self.tags = OrderedDict()
+        self.counts = OrderedDict() # column -> list of value_counts, or [CountMinSketch]
+        self.sketch = sketch
+        self.anonymous = set() # sketched columns with the id -1
+        self.timings = [] # (name, rows, seconds) of each scanned file
+
+    def update(self, df, categorical, counted):
+        for c in categorical:
+            if c not in df:
+                continue
+            values = df[c].dropna().str.lower().unique()
+            if c == "REVISION_TAGS":
+                for value in values:
+                    for tag in value.split(","):
+                        self.tags[tag.strip()] = None
+            if c == "afectedProperty":
+                values = [v.split(":")[0].strip() for v in values]
+            self.values.setdefault(c, OrderedDict()).update((v, None) for v in values)
+        for c in counted:
+            if c not in df:
+                continue
+            if self.sketch is None:
+                self.counts.setdefault(c, []).append(df[c].dropna().value_counts())
+                continue
+            ids = df[c].dropna().values
+            known = ids[ids != -1]
+            if len(known) < len(ids):
+                self.anonymous.add(c)
+            if c not in self.counts:
+                self.counts[c] = [CountMinSketch.from_error(*self.sketch)]
+            self.counts[c][0].add(known)
+
+    def reduce(self):
+        """Sums the counts collected so far into one Series per column"""
+        for c, counts in self.counts.items():
+            if (self.sketch is None) and (len(counts) > 1):
+                self.counts[c] = [pd.concat(counts).groupby(level=0).sum()]
+        return self
+
+    def merge(self, other):
+        for c, values in other.values.items():
+            self.values.setdefault(c, OrderedDict()).update(values)
+        self.tags.update(other.tags)
+        for c, counts in other.counts.items():
+            if (self.sketch is not None) and (c in self.counts):
+                self.counts[c][0].merge(counts[0])
+            else:
+                self.counts.setdefault(c, []).extend(counts)
+        self.anonymous.update(other.anonymous)
+        self.timings.extend(other.timings)
+        return self
+
+    def vocabulary(self, c):
+        return list(self.values.get(c, ()))
+
+    def counter(self, c):
+        self.reduce()
+        if self.counts.get(c):
+            return self.counts[c][0]
+        if self.sketch is not None:
+            return CountMinSketch.from_error(*self.sketch)
+        return pd.Series([], dtype="int64")
+
+
+def scan_file(name, chunks, categorical, counted, sketch=None):
+    """Mappings of a file, chunks is a function returning its chunks"""
+    start = timer()
+    res = Mappings(sketch)
+    rows = 0
+    for chunk in chunks():
+        res.update(chunk, categorical, counted)
+        rows += len(chunk)
+        # keeps memory bounded by the distinct ids, not the rows, of the file
+        res.reduce()
+    res.timings.append((name, rows, timer() - start))
+    return res
+
+
+def scan(sources, categorical, counted, n_jobs=1, sketch=None):
+    """Merged Mappings of sources, a list of (name, chunks)"""
+    partials = Parallel(n_jobs=n_jobs)(delayed(scan_file)(name, chunks, categorical, counted, sketch)
+                                        for name, chunks in sources)
+    res = Mappings(sketch)
+    for partial in partials:
+        res.merge(partial)
+    return res.reduce()
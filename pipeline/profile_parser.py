@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:05:14 2026
+
+Per function profile of the revision parser on the first revisions of a
+dump. Run it on the same sample before and after a change to the parser to
+see which functions got slower. Splitting the dump is profiled separately
+from parsing, and the langid model is loaded before profiling starts.
+"""
+########## IMPORTS ###########
+import argparse
+import cProfile
+import pstats
+from itertools import islice
+from timeit import default_timer as timer
+
+from rev_parser import revision_generator, parse_batch
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup parser profile')
+parser.add_argument('-file', action = "store", dest = "file", help = 'xml dump, plain or compressed', required = True)
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 10000, help = 'revisions to parse')
+parser.add_argument('-sort', action = "store", dest = "sort", default = "tottime", help = 'pstats sort key: tottime, cumtime, ncalls...')
+parser.add_argument('-limit', action = "store", dest = "limit", type = int, default = 30, help = 'functions to print')
+parser.add_argument('-lang_cache_size', action = "store", dest = "lang_cache_size", type = int, default = 2 ** 16, help = 'langid cache size, 0 to profile langid on every tail')
+parser.add_argument('-out', action = "store", dest = "out", help = 'also save the raw stats to this file, for snakeviz or pstats')
+args = parser.parse_args()
+
+########## SCRIPT ###########
+
+def profile(name, func):
+    prof = cProfile.Profile()
+    start = timer()
+    prof.enable()
+    res = func()
+    prof.disable()
+    enlapsed = timer() - start
+    print("***** {0}: {1} revisions in {2:.2f}s, {3:.0f} revisions/sec *****".format(name, len(res), enlapsed, len(res) / max(enlapsed, 1e-9)))
+    return res, prof
+
+# a first small batch loads langid, away from the profile
+parse_batch(list(islice(revision_generator(args.file), 1)), 0)
+
+cases, split_prof = profile("split", lambda: list(islice(revision_generator(args.file), args.n)))
+pstats.Stats(split_prof).sort_stats(args.sort).print_stats(min(args.limit, 10))
+
+_, parse_prof = profile("parse", lambda: parse_batch(cases, args.lang_cache_size))
+stats = pstats.Stats(parse_prof)
+stats.sort_stats(args.sort).print_stats(args.limit)
+
+if args.out:
+    stats.dump_stats(args.out)
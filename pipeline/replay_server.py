@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:14:52 2026
+
+Local stand-in for the WSDM Cup evaluation server, used to benchmark the
+production Client. It waits for the authentication token, then for every
+revision of a local dump sends the metadata csv line and the revision xml
+as two length prefixed messages, and reads the REVISION_ID,VANDALISM_SCORE
+answers back.
+
+At the end it reports revisions/sec, per revision latency (from sending
+the revision to receiving its answer) percentiles and the backlog of
+revisions sent but not answered yet. Revisions are read from the dump as
+they are sent, so memory does not grow with the dump; only the position of
+each revision id is kept, to check the order of the answers.
+"""
+########## IMPORTS ###########
+import time
+import socket
+import struct
+import argparse
+import threading
+
+import numpy as np
+
+from dump_reader import open_dump
+from rev_parser import revision_chunks, tag_value
+
+########## CONFIG ###########
+
+parser = argparse.ArgumentParser(description='WSDM Cup replay server')
+parser.add_argument('-dump', action = "store", dest = "dump", help = 'xml dump, plain or compressed', required = True)
+parser.add_argument('-meta', action = "store", dest = "meta", help = 'meta csv for the revisions of the dump')
+parser.add_argument('-port', action = "store", dest = "port", type = int, default = 9999, help = 'port to listen on')
+parser.add_argument('-n', action = "store", dest = "n", type = int, default = 0, help = 'max revisions to send, 0 for all')
+parser.add_argument('-rate', action = "store", dest = "rate", type = float, default = 0, help = 'revisions/sec to send at, 0 for as fast as possible')
+parser.add_argument('-backlog', action = "store", dest = "backlog", type = int, default = 0, help = 'max revisions sent and not answered, 0 for no limit')
+
+########## SCRIPT ###########
+
+meta_header = "REVISION_ID,REVISION_SESSION_ID,USER_COUNTRY_CODE,USER_CONTINENT_CODE,USER_TIME_ZONE,USER_REGION_CODE,USER_CITY_NAME,USER_COUNTY_NAME,REVISION_TAGS"
+
+
+def frame(data):
+    return struct.pack('>I', len(data)) + data
+
+
+def read_meta(meta_file):
+    with open(meta_file, encoding="utf-8") as f:
+        header = f.readline().strip()
+        return header, {line.split(",", 1)[0]: line.strip() for line in f}
+
+
+# Yields the revision id and the two messages the server sends for it
+def stream_messages(dump_file, meta_file=None, n=0):
+    if meta_file:
+        header, meta = read_meta(meta_file)
+    else:
+        header, meta = meta_header, {}
+    empty = "," * header.count(",")
+    with open_dump(dump_file) as f:
+        for i, raw in enumerate(revision_chunks(f)):
+            if (n > 0) and (i >= n):
+                break
+            cont_start = raw.find(b"<contributor")
+            revid = tag_value(raw, b"id", 0, cont_start if cont_start != -1 else len(raw)) or ""
+            line = meta.get(revid, revid + empty)
+            if i == 0:
+                line = header + "\r\n" + line
+            yield revid, frame((line + "\r\n").encode("utf-8")), \
+                frame(b"<page>\n    <revision>" + raw + b"</revision>\n  </page>\n")
+
+
+class Replay(object):
+
+    def __init__(self, conn, rate=0, backlog=0):
+        self.conn = conn
+        self.rate = rate
+        self.backlog = backlog
+        self.sent = {}
+        self.n_sent = 0
+        self.n_answered = 0
+        self.latencies = []
+        self.backlogs = []
+        self.answered = []
+        self.positions = {} # revid -> order in which it was sent
+        self.cond = threading.Condition()
+
+    def send(self, messages):
+        start = time.time()
+        for i, (revid, meta, rev) in enumerate(messages):
+            if self.rate > 0:
+                wait = start + i / self.rate - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+            with self.cond:
+                while (self.backlog > 0) and (self.n_sent - self.n_answered >= self.backlog):
+                    self.cond.wait()
+                self.backlogs.append(self.n_sent - self.n_answered)
+                self.sent[revid] = time.time()
+                self.positions.setdefault(revid, self.n_sent)
+                self.n_sent += 1
+            self.conn.sendall(meta + rev)
+        self.conn.shutdown(socket.SHUT_WR)
+
+    def receive(self):
+        for line in self.conn.makefile("rb"):
+            now = time.time()
+            revid = line.split(b",", 1)[0].decode("utf-8").strip()
+            if revid == "REVISION_ID":
+                continue
+            with self.cond:
+                sent = self.sent.pop(revid, None)
+                if sent is not None:
+                    self.latencies.append(now - sent)
+                self.answered.append(revid)
+                self.n_answered += 1
+                self.cond.notify()
+
+    def report(self, elapsed):
+        # answers sent before the answer of an earlier revision, a missing or
+        # unknown answer does not shift the ones after it
+        out_of_order, last = 0, -1
+        for revid in self.answered:
+            i = self.positions.get(revid)
+            if i is None:
+                continue
+            if i < last:
+                out_of_order += 1
+            last = max(last, i)
+        lat = np.asarray(self.latencies) * 1000
+        print("revisions sent: {0}, answered: {1}, unanswered: {2}, out of order: {3}".format(
+            self.n_sent, self.n_answered, len(self.sent), out_of_order))
+        print("throughput: {0:.1f} revisions/sec in {1:.1f}s".format(self.n_answered / elapsed, elapsed))
+        if len(lat) > 0:
+            print("latency ms: p50 {0:.2f}, p90 {1:.2f}, p99 {2:.2f}, max {3:.2f}".format(
+                *np.percentile(lat, [50, 90, 99, 100])))
+        if len(self.backlogs) > 0:
+            print("backlog: mean {0:.1f}, max {1}".format(np.mean(self.backlogs), max(self.backlogs)))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind(("", args.port))
+    srv.listen(1)
+    print("waiting for client on port", args.port)
+    conn, addr = srv.accept()
+
+    token = b""
+    while not token.endswith(b"\r\n"):
+        data = conn.recv(1)
+        if not data:
+            break
+        token += data
+    print("client", addr, "token", token.strip().decode("utf-8", "replace"))
+
+    replay = Replay(conn, args.rate, args.backlog)
+    receiver = threading.Thread(target=replay.receive)
+    receiver.start()
+    start = time.time()
+    replay.send(stream_messages(args.dump, args.meta, args.n))
+    receiver.join()
+    elapsed = time.time() - start
+    conn.close()
+    srv.close()
+
+    replay.report(elapsed)
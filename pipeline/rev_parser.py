@@ -6,14 +6,8 @@ Created on Tue Nov 29 11:37:49 2016
 """
 
 
+import os
 import re
-import json
-from collections import defaultdict
-
-from nltk.tokenize import RegexpTokenizer
-from fuzzywuzzy import fuzz
-import unicodedata as ud
-from scipy import stats
 
 try:
     from langid import LanguageIdentifier, model
@@ -21,8 +15,59 @@ except:
     from langid.langid import LanguageIdentifier, model
 
 import utils
+from lexicon import Lexicon
+from char_features import char_features
+from lang_cache import LangCache
+from lang_subset import SubsetIdentifier
+from similarity import best_similarities
+from entity import Entity
+
+identifier = None
+
+
+def init_identifier():
+    global identifier
+    if identifier is None:
+        identifier = LanguageIdentifier.from_modelstring(model, norm_probs=True)
+    return identifier
+
+
+lang_subset = None
+
+
+# The full model is keyed by tail, the candidate subset by (tail, lang)
+def classify(key):
+    if lang_subset is None:
+        return init_identifier().classify(key)
+    return lang_subset.classify(*key)
+
 
-identifier = LanguageIdentifier.from_modelstring(model, norm_probs=True)
+def lang_signature():
+    return lang_subset.langs if lang_subset else None
+
+
+# Restricts lang_probs to these languages plus the claimed one, None for all
+def init_lang_subset(candidates=None):
+    global lang_subset
+    candidates = list(candidates) if candidates else None
+    if candidates != lang_signature():
+        lang_subset = SubsetIdentifier(init_identifier(), candidates) if candidates else None
+    return lang_subset
+
+lang_cache = LangCache(classify)
+lang_cache_config = (lang_cache.maxsize, None, None)
+
+
+# Replaces the langid cache unless it already has this size, file and
+# candidates, so every joblib worker can call it for each batch
+def init_lang_cache(maxsize=2 ** 16, path=None):
+    global lang_cache, lang_cache_config
+    if lang_cache_config != (maxsize, path, lang_signature()):
+        cache = LangCache(classify, maxsize, lang_signature())
+        if (path is not None) and os.path.exists(path):
+            cache.load(path)
+        lang_cache, lang_cache_config = cache, (maxsize, path, lang_signature())
+    return lang_cache
 
 
 def xml_generator(file_path):
@@ -40,11 +85,95 @@ def xml_generator(file_path):
             elif "<revision>" in line:
                 rev_start = True
 
+
+def revision_chunks(f, chunk_size=2 ** 24):
+    rev_open, rev_close = b"<revision>", b"</revision>"
+    buf = b""
+    pos = 0
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        buf = buf[pos:] + chunk
+        pos = 0
+        while True:
+            start = buf.find(rev_open, pos)
+            if start == -1:
+                pos = max(pos, len(buf) - len(rev_open) + 1)
+                break
+            end = buf.find(rev_close, start)
+            if end == -1:
+                pos = start
+                break
+            yield buf[start + len(rev_open):end]
+            pos = end + len(rev_close)
+
+
+def tag_value(raw, tag, start=0, end=None):
+    if end is None:
+        end = len(raw)
+    open_tag = b"<" + tag
+    i = raw.find(open_tag, start, end)
+    while i != -1:
+        after = raw[i + len(open_tag):i + len(open_tag) + 1]
+        if after in (b">", b" ", b"/"):
+            break
+        i = raw.find(open_tag, i + len(open_tag), end)
+    if i == -1:
+        return None
+    gt = raw.find(b">", i, end)
+    if (gt == -1) or (raw[gt - 1:gt] == b"/"):
+        return None
+    close = raw.find(b"</" + tag + b">", gt, end)
+    if close == -1:
+        return None
+    return raw[gt + 1:close].decode("utf-8")
+
+
+def revision_case(raw):
+    case = {}
+    cont_start = raw.find(b"<contributor>")
+    if cont_start == -1:
+        spans = [(0, len(raw))]
+    else:
+        cont_end = raw.find(b"</contributor>", cont_start)
+        if cont_end == -1:
+            cont_end = len(raw)
+        userid = tag_value(raw, b"id", cont_start, cont_end)
+        if userid is not None:
+            case["userid"] = userid
+        spans = [(0, cont_start), (cont_end, len(raw))]
+
+    if raw.find(b"<minor/>") != -1:
+        case["minor"] = 1
+
+    for tag in ["id", "timestamp", "comment", "text"]:
+        for start, end in spans:
+            value = tag_value(raw, tag.encode("ascii"), start, end)
+            if value is not None:
+                case[tag] = value
+                break
+    return case
+
+
+def revision_generator(f, chunk_size=2 ** 24):
+    if isinstance(f, str):
+        with open(f, "rb") as fb:
+            for raw in revision_chunks(fb, chunk_size):
+                yield revision_case(raw)
+    else:
+        for raw in revision_chunks(f, chunk_size):
+            yield revision_case(raw)
+
 tag_regex = re.compile(r'<(\w*)(>|.*>)')
 text_regex = re.compile(r'>(.*)<')
 
 
 def parse_xml(xml_text):
+    return parse_revision(xml_to_case(xml_text))
+
+
+def xml_to_case(xml_text):
     cont_start = False
     revision = {}
     for i, line in enumerate(xml_text):
@@ -63,7 +192,13 @@ def parse_xml(xml_text):
                     pass
             if "</contributor>" in line:
                 cont_start = False
-    return parse_revision(revision)
+    return revision
+
+def parse_batch(cases, cache_size=2 ** 16, cache_file=None, lang_candidates=None):
+    init_identifier()
+    init_lang_subset(lang_candidates)
+    init_lang_cache(cache_size, cache_file)
+    return [parse_revision(case) for case in cases]
 
 control_props = ["P227", "P213", "P244", "P245", "P214", "P268", "P269",
                  "P1025", "P270", "P271", "P349", "P396", "P409", "P1315",
@@ -106,16 +241,11 @@ def parse_revision(case):
           "sitelinks": {}
       }"""
 
-    obj_dict = case.get("text", base_json)
+    obj_dict = Entity(case.get("text", base_json))
     res["json_len"] = len(obj_dict)
-    obj_dict = json.loads(obj_dict)
-
-    res["itemid"] = int(obj_dict.get("id", "-1").lower().strip("q"))
 
-    try:
-        res["instanceOf"] = obj_dict["claims"]["P31"][0]["mainsnak"]["datavalue"]["value"]["numeric-id"]
-    except:
-        res["instanceOf"] = None
+    res["itemid"] = int(obj_dict.item_id().lower().strip("q"))
+    res["instanceOf"] = obj_dict.instance_of()
 
 
     action = res.get("action", "unknown").lower().strip()
@@ -220,6 +350,11 @@ other_regex = re.compile(r'(?P<tail>.{0,})(?P<action>restore|revert|undo|undid).
                          re.IGNORECASE)
 
 
+# Necessary for other_regex to match, found in linear time (other_regex
+# backtracks a lot when it fails)
+contributions_regex = re.compile(r'\[\[special:contributions\/', re.IGNORECASE)
+
+
 def parse_comment(comment):
     if comment.startswith("/*"):
         try:
@@ -234,10 +369,10 @@ def parse_comment(comment):
 
     for act in ["revert", "undid", "restore", "undo"]:
         if (act in l_comment) and ("[[" in l_comment):
-            try:
-                return other_regex.search(comment).groupdict()
-            except:
-                return {"action": act, "tail": comment}
+            match = contributions_regex.search(comment) and other_regex.search(comment)
+            if match:
+                return match.groupdict()
+            return {"action": act, "tail": comment}
     return {"action": "unknown", "tail": comment}
 
 
@@ -263,7 +398,7 @@ def parse_claim(tail):
 def lang_probs(tail, lang):
     if len(tail) == 0:
         return {}
-    lang_2, prob = identifier.classify(tail)
+    lang_2, prob = lang_cache.get(tail if lang_subset is None else (tail, lang))
     if lang == lang_2:
         return {"lang_prob": prob}
     else:
@@ -272,11 +407,16 @@ def lang_probs(tail, lang):
 lang_regex = "(^|\\n)([ei]n )??(a(frikaa?ns|lbanian?|lemanha|ng(lais|ol)|ra?b(e?|[ei]c|ian?|isc?h)|rmenian?|ssamese|azeri|z[e\\u0259]rba(ijani?|ycan(ca)?|yjan)|\\u043d\\u0433\\u043b\\u0438\\u0439\\u0441\\u043a\\u0438\\u0439)|b(ahasa( (indonesia|jawa|malaysia|melayu))?|angla|as(k|qu)e|[aeo]ng[ao]?li|elarusian?|okm\\u00e5l|osanski|ra[sz]il(ian?)?|ritish( kannada)?|ulgarian?)|c(ebuano|hina|hinese( simplified)?|zech|roat([eo]|ian?)|atal[a\\u00e0]n?|\\u0440\\u043f\\u0441\\u043a\\u0438|antonese)|[c\\u010d](esky|e[s\\u0161]tina)\r\n|d(an(isc?h|sk)|e?uts?ch)|e(esti|ll[hi]nika|ng(els|le(ski|za)|lisc?h)|spa(g?[n\\u00f1]h?i?ol|nisc?h)|speranto|stonian|usk[ae]ra)|f(ilipino|innish|ran[c\\u00e7](ais|e|ez[ao])|ren[cs]h|arsi|rancese)|g(al(ego|ician)|uja?rati|ree(ce|k)|eorgian|erman[ay]?|ilaki)|h(ayeren|ebrew|indi|rvatski|ungar(y|ian))|i(celandic|ndian?|ndonesian?|ngl[e\\u00ea]se?|ngilizce|tali(ano?|en(isch)?))|ja(pan(ese)?|vanese)|k(a(nn?ada|zakh)|hmer|o(rean?|sova)|urd[i\\u00ee])|l(at(in[ao]?|vi(an?|e[s\\u0161]u))|ietuvi[u\\u0173]|ithuanian?)|m(a[ck]edon(ian?|ski)|agyar|alay(alam?|sian?)?|altese|andarin|arathi|elayu|ontenegro|ongol(ian?)|yanmar)|n(e(d|th)erlands?|epali|orw(ay|egian)|orsk( bokm[a\\u00e5]l)?|ynorsk)|o(landese|dia)|p(ashto|ersi?an?|ol(n?isc?h|ski)|or?tugu?[e\\u00ea]se?(( d[eo])? brasil(eiro)?| ?\\(brasil\\))?|unjabi)|r(om[a\\u00e2i]ni?[a\\u0103]n?|um(ano|\\u00e4nisch)|ussi([ao]n?|sch))|s(anskrit|erbian|imple english|inha?la|lov(ak(ian?)?|en\\u0161?[c\\u010d]ina|en(e|ij?an?)|uomi)|erbisch|pagnolo?|panisc?h|rbeska|rpski|venska|c?wedisc?h|hqip)|t(a(galog|mil)|elugu|hai(land)?|i[e\\u1ebf]ng vi[e\\u1ec7]t|[u\\u00fc]rk([c\\u00e7]e|isc?h|i\\u015f|ey))|u(rdu|zbek)|v(alencia(no?)?|ietnamese)|welsh|(\\u0430\\u043d\\u0433\\u043b\\u0438\\u0438\\u0441|[k\\u043a]\\u0430\\u043b\\u043c\\u044b\\u043a\\u0441|[k\\u043a]\\u0430\\u0437\\u0430\\u0445\\u0441|\\u043d\\u0435\\u043c\\u0435\\u0446|[p\\u0440]\\u0443\\u0441\\u0441|[y\\u0443]\\u0437\\u0431\\u0435\\u043a\\u0441)\\u043a\\u0438\\u0439( \\u044f\\u0437\\u044b\\u043a)??|\\u05e2\\u05d1\\u05e8\\u05d9\\u05ea|[k\\u043a\\u049b](\\u0430\\u0437\\u0430[\\u043a\\u049b]\\u0448\\u0430|\\u044b\\u0440\\u0433\\u044b\\u0437\\u0447\\u0430|\\u0438\\u0440\\u0438\\u043b\\u043b)|\\u0443\\u043a\\u0440\\u0430\\u0457\\u043d\\u0441\\u044c\\u043a(\\u0430|\\u043e\\u044e)|\\u0431(\\u0435\\u043b\\u0430\\u0440\\u0443\\u0441\\u043a\\u0430\\u044f|\\u044a\\u043b\\u0433\\u0430\\u0440\\u0441\\u043a\\u0438( \\u0435\\u0437\\u0438\\u043a)?)|\\u03b5\\u03bb\\u03bb[\\u03b7\\u03b9]\\u03bd\\u03b9\\u03ba(\\u03ac|\\u03b1)|\\u10e5\\u10d0\\u10e0\\u10d7\\u10e3\\u10da\\u10d8|\\u0939\\u093f\\u0928\\u094d\\u0926\\u0940|\\u0e44\\u0e17\\u0e22|[m\\u043c]\\u043e\\u043d\\u0433\\u043e\\u043b(\\u0438\\u0430)?|([c\\u0441]\\u0440\\u043f|[m\\u043c]\\u0430\\u043a\\u0435\\u0434\\u043e\\u043d)\\u0441\\u043a\\u0438|\\u0627\\u0644\\u0639\\u0631\\u0628\\u064a\\u0629|\\u65e5\\u672c\\u8a9e|\\ud55c\\uad6d(\\ub9d0|\\uc5b4)|\\u200c\\u0939\\u093f\\u0928\\u0926\\u093c\\u093f|\\u09ac\\u09be\\u0982\\u09b2\\u09be|\\u0a2a\\u0a70\\u0a1c\\u0a3e\\u0a2c\\u0a40|\\u092e\\u0930\\u093e\\u0920\\u0940|\\u0c95\\u0ca8\\u0ccd\\u0ca8\\u0ca1|\\u0627\\u064f\\u0631\\u062f\\u064f\\u0648|\\u0ba4\\u0bae\\u0bbf\\u0bb4\\u0bcd|\\u0c24\\u0c46\\u0c32\\u0c41\\u0c17\\u0c41|\\u0a97\\u0ac1\\u0a9c\\u0ab0\\u0abe\\u0aa4\\u0ac0|\\u0641\\u0627\\u0631\\u0633\\u06cc|\\u067e\\u0627\\u0631\\u0633\\u06cc|\\u0d2e\\u0d32\\u0d2f\\u0d3e\\u0d33\\u0d02|\\u067e\\u069a\\u062a\\u0648|\\u1019\\u103c\\u1014\\u103a\\u1019\\u102c\\u1018\\u102c\\u101e\\u102c|\\u4e2d\\u6587(\\u7b80\\u4f53|\\u7e41\\u9ad4)?|\\u4e2d\\u6587\\uff08(\\u7b80\\u4f53?|\\u7e41\\u9ad4)\\uff09|\\u7b80\\u4f53|\\u7e41\\u9ad4)( language)??($|\\n)"
 
 lang_regex = re.compile(lang_regex, re.IGNORECASE)
+lang_words = Lexicon(regex=lang_regex)
+bad_words = Lexicon(words=utils.bad_words)
 url_regex = 'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
 url_regex = re.compile(url_regex, re.IGNORECASE)
 
+# Same as the RegexpTokenizer(r'\w+') of nltk, compiled once
+word_regex = re.compile(r'\w+', re.UNICODE | re.MULTILINE | re.DOTALL)
+
 def parse_tail(tail):
-    tail_words =  RegexpTokenizer(r'\w+').tokenize(tail)
+    tail_words = word_regex.findall(tail)
     tail_length = len(tail_words)
 
     if tail_length == 0:
@@ -296,9 +436,9 @@ def parse_tail(tail):
             continue
         elif lw > long_w:
             long_w = lw
-        if lang_regex.search(word):
+        if word in lang_words:
             word_feats["languageWordRatio"] += 1
-        elif word.lower() in utils.bad_words:
+        elif word in bad_words:
             word_feats["badWordRatio"] += 1
         if word[0].islower():
             word_feats["lowerCaseWordRatio"] += 1
@@ -309,53 +449,7 @@ def parse_tail(tail):
     word_feats["containsLanguageWord"] = int(word_feats["languageWordRatio"] > 0)
     word_feats["longestWord"] = long_w
 
-    char_feats = {
-        "upperCaseRatio": 0,
-        "lowerCaseRatio": 0,
-        "simbolRatio": 0,
-        "alphanumericRatio": 0,
-        "digitRatio": 0,
-        "punctuationRatio": 0,
-        "bracketRatio": 0,
-        "whitespaceRatio": 0,
-        "latinRatio": 0,
-        "nonLatinRatio": 0
-    }
-
-    alphabets = []
-    prev_char = ""
-    char_seq = [1]
-    for t in tail:
-        if t == prev_char:
-            char_seq[-1] += 1
-        else:
-            char_seq.append(1)
-        prev_char = t
-        if t == " ":
-            char_feats["whitespaceRatio"] += 1
-        elif t in ",.;:´¨'\"?¿!¡":
-            char_feats["punctuationRatio"] += 1
-        elif t in "&%$#@+-_*/\\":
-            char_feats["simbolRatio"] += 1
-        elif t in "{}[]()":
-            char_feats["bracketRatio"] += 1
-        elif t.isupper():
-            char_feats["upperCaseRatio"] += 1
-        elif t.islower():
-            char_feats["lowerCaseRatio"] += 1
-            char_feats["alphanumericRatio"] += 1
-        elif t in "1234567890":
-            char_feats["digitRatio"] += 1
-            char_feats["alphanumericRatio"] += 1
-        alphabets.append(ud.name(t, "unknown").split(" ")[0])
-        if alphabets[-1] == "LATIN":
-            char_feats["latinRatio"] += 1
-        else:
-            char_feats["nonLatinRatio"] += 1
-    tl = len(tail)
-    char_feats = {k: char_feats[k] / tl for k in char_feats.keys()}
-    char_feats["main_alphabet"] = stats.mode(alphabets)[0][0]
-    char_feats["longestCharacterSequence"] = max(char_seq)
+    char_feats = char_features(tail)
 
     char_feats.update(word_feats)
     if url_regex.search(tail):
@@ -412,18 +506,4 @@ def label_link_similarity(tipo, lang, tail, obj_dict):
 
 
 def compute_similarities(tail, arr):
-    res = defaultdict(list)
-    for a in arr:
-        try:
-            res["fuzzy_total"].append(fuzz.ratio(tail, a))
-        except:
-            pass
-        try:
-            res["fuzzy_partial"].append(fuzz.partial_ratio(tail, a))
-        except:
-            pass
-    try:
-        res = {k: max(res[k]) for k in res.keys()}
-    except:
-        res = {}
-    return res
+    return best_similarities(tail, arr)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:02:18 2026
+
+Running mean of the probabilities of each session, for the Classifier.
+
+Every session keeps its sum and count of probabilities, so adding one is
+O(1) whatever the length of the session. Sessions are kept least recently
+used first and the oldest ones are dropped when there are more than
+maxsize of them, when no revision of theirs arrived in the last
+max_idle_revs revision ids or in the last max_idle_secs seconds (0 turns
+each limit off). Revision ids grow along the stream, so checking the
+oldest sessions is enough. The store can be saved to a json file and
+loaded by a restarted client, idle times start again from the load.
+"""
+
+import os
+import json
+from time import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SessionStore(object):
+
+    def __init__(self, maxsize=2 ** 20, max_idle_revs=0, max_idle_secs=0):
+        self.maxsize = maxsize
+        self.max_idle_revs = max_idle_revs
+        self.max_idle_secs = max_idle_secs
+        self.sessions = OrderedDict() # sessid -> [sum, count, last revid, last time, type of the mean]
+        self.last_revid = None
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, sessid):
+        return sessid in self.sessions
+
+    def add(self, sessid, prob, revid=None):
+        """Adds prob to the session and returns the mean of the session. Like
+        np.mean of the probabilities, it is a float32 when all of them are
+        float32 and a float otherwise"""
+        now = time()
+        session = self.sessions.get(sessid)
+        if session is None:
+            session = [0.0, 0, revid, now, type(prob)]
+            self.sessions[sessid] = session
+        else:
+            self.sessions.move_to_end(sessid)
+            if session[4] is not type(prob):
+                session[4] = float
+        session[0] += float(prob)
+        session[1] += 1
+        session[2], session[3] = revid, now
+        if revid is not None:
+            self.last_revid = revid if self.last_revid is None else max(revid, self.last_revid)
+        self.evict(now)
+        return session[4](session[0] / session[1])
+
+    def idle(self, session, now):
+        if (self.max_idle_revs > 0) and (session[2] is not None) and (self.last_revid is not None) \
+                and (self.last_revid - session[2] > self.max_idle_revs):
+            return True
+        return (self.max_idle_secs > 0) and (now - session[3] > self.max_idle_secs)
+
+    def evict(self, now=None):
+        now = time() if now is None else now
+        while len(self.sessions) > 0:
+            oldest = next(iter(self.sessions.values()))
+            if not ((self.maxsize > 0 and len(self.sessions) > self.maxsize) or self.idle(oldest, now)):
+                break
+            self.sessions.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {"size": len(self.sessions), "evictions": self.evictions}
+
+    # Sessions are stored least recently used first, so loading keeps the order
+    def save(self, path):
+        entries = [[sessid, total, count, revid, kind is not float]
+                   for sessid, (total, count, revid, _, kind) in self.sessions.items()]
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"last_revid": self.last_revid, "entries": entries}, f)
+        os.replace(path + ".tmp", path)
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+        now = time()
+        for sessid, total, count, revid, single in saved["entries"]:
+            self.sessions.pop(sessid, None)
+            self.sessions[sessid] = [total, count, revid, now, np.float32 if single else float]
+        if saved["last_revid"] is not None:
+            self.last_revid = saved["last_revid"] if self.last_revid is None else max(saved["last_revid"], self.last_revid)
+        self.evict(now)
+        return len(saved["entries"])
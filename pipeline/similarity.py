@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:48:31 2026
+
+Fuzzy similarity of a tail against the labels or sitelink titles of an item.
+
+Two backends give the same scores: "fuzzywuzzy" calls fuzz.ratio and
+fuzz.partial_ratio, "levenshtein" reimplements both straight on top of
+python-Levenshtein (what fuzzywuzzy itself runs on when it is installed),
+without the SequenceMatcher objects and decorators around every call.
+best_similarities compares one tail with many candidates and stops as soon
+as both maxima are 100.
+"""
+
+from fuzzywuzzy import fuzz
+
+try:
+    import Levenshtein
+except ImportError:
+    Levenshtein = None
+
+
+def intr(n):
+    return int(round(n))
+
+
+# Same checks, in the same order, as the fuzzywuzzy decorators
+def trivial_score(s1, s2):
+    if s1 is None or s2 is None:
+        return 0
+    if s1 == s2:
+        return 100
+    if len(s1) == 0 or len(s2) == 0:
+        return 0
+    return None
+
+
+def ratio(s1, s2):
+    score = trivial_score(s1, s2)
+    if score is not None:
+        return score
+    if not (isinstance(s1, str) and isinstance(s2, str)):
+        s1, s2 = str(s1), str(s2)
+    return intr(100 * Levenshtein.ratio(s1, s2))
+
+
+# fuzz.partial_ratio: ratio of the shorter string against the window of the
+# longer one aligned with each matching block, 100 as soon as one is > .995
+def partial_ratio(s1, s2):
+    score = trivial_score(s1, s2)
+    if score is not None:
+        return score
+    if not (isinstance(s1, str) and isinstance(s2, str)):
+        s1, s2 = str(s1), str(s2)
+    if len(s1) <= len(s2):
+        shorter, longer = s1, s2
+    else:
+        shorter, longer = s2, s1
+
+    best = 0
+    n = len(shorter)
+    for block in Levenshtein.matching_blocks(Levenshtein.opcodes(shorter, longer), shorter, longer):
+        long_start = max(block[1] - block[0], 0)
+        r = Levenshtein.ratio(shorter, longer[long_start:long_start + n])
+        if r > .995:
+            return 100
+        elif r > best:
+            best = r
+    return intr(100 * best)
+
+
+backends = {"fuzzywuzzy": (fuzz.ratio, fuzz.partial_ratio)}
+if Levenshtein is not None:
+    backends["levenshtein"] = (ratio, partial_ratio)
+
+default_backend = "levenshtein" if Levenshtein is not None else "fuzzywuzzy"
+
+
+def best_similarities(tail, candidates, backend=None):
+    """Max fuzzy_total and fuzzy_partial of tail against the candidates, keys
+    are left out when every comparison failed"""
+    ratio_func, partial_func = backends[backend or default_backend]
+    try:
+        candidates = list(dict.fromkeys(candidates))
+    except TypeError:
+        pass
+
+    best_total, best_partial = None, None
+    for a in candidates:
+        if best_total != 100:
+            try:
+                score = ratio_func(tail, a)
+                if (best_total is None) or (score > best_total):
+                    best_total = score
+            except:
+                pass
+        if best_partial != 100:
+            try:
+                score = partial_func(tail, a)
+                if (best_partial is None) or (score > best_partial):
+                    best_partial = score
+            except:
+                pass
+        if best_total == 100 and best_partial == 100:
+            break
+
+    res = {}
+    if best_total is not None:
+        res["fuzzy_total"] = best_total
+    if best_partial is not None:
+        res["fuzzy_partial"] = best_partial
+    return res
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 10:05:44 2026
+
+The training files (a DataFrame) and the client (a list of dicts) must get
+the same features for the same revisions. Run with python -m pytest from
+the pipeline directory.
+"""
+
+import numpy as np
+import pandas as pd
+
+from encoders import CounterTable
+from features import FeatureEncoder
+
+mappers = {"lang": {"en": 0, "de": 1, "": 2},
+           "afectedProperty": {"p31": 0, "p21": 1},
+           "REVISION_TAGS": {"bot": 0}}
+counters = {"itemid": CounterTable([10, 11, -1], [5, 2, 1]),
+            "userid": CounterTable([7, -1], [3, 1])}
+tags = ["mobile edit", "visualeditor"]
+priv_users = [7]
+
+records = [
+    {"itemid": 10, "userid": 7, "timestamp": "2016-03-01 14:05:00", "lang": "EN",
+     "afectedProperty": "P31:Q5", "REVISION_TAGS": "mobile edit,visualeditor", "size": 3.5},
+    # unseen category and property, unknown ids, no tags
+    {"itemid": 12, "userid": 99, "timestamp": "2016-03-01 00:59:59", "lang": "fr",
+     "afectedProperty": "P999", "REVISION_TAGS": np.nan, "size": 0},
+    # anonymous user, nan itemid, unparseable timestamp, tags are matched
+    # as they are in the raw value, not lowercased
+    {"itemid": np.nan, "userid": -1, "timestamp": "not a date", "lang": "de",
+     "afectedProperty": " p21 : x", "REVISION_TAGS": "Mobile Edit", "size": np.nan},
+    # missing keys
+    {"itemid": 11},
+]
+
+columns = ["itemid", "userid", "size", "hour", "lang_encoded", "afectedProperty_encoded",
+           "TAG:mobile edit", "TAG:visualeditor", "itemid_freq", "userid_freq",
+           "priv_user", "is_reg"]
+
+
+def encoder():
+    return FeatureEncoder(mappers, counters, tags, priv_users)
+
+
+def test_frame_and_records_match():
+    features = encoder()
+    frame = features.encode(pd.DataFrame(records), columns)
+    dicts = features.encode_records(records, columns)
+    assert frame.dtype == dicts.dtype == np.float32
+    np.testing.assert_array_equal(frame, dicts)
+
+
+def test_rows_do_not_depend_on_the_batch():
+    features = encoder()
+    batch = features.encode_records(records, columns)
+    for i, record in enumerate(records):
+        np.testing.assert_array_equal(features.encode_records([record], columns)[0], batch[i])
+
+
+def test_values():
+    rows = pd.DataFrame(encoder().encode_records(records, columns), columns=columns)
+    assert list(rows["hour"]) == [14, 0, -1, -1]
+    # missing reads as "", which the lang mapper has
+    assert list(rows["lang_encoded"]) == [0, -1, 1, 2]
+    assert list(rows["afectedProperty_encoded"]) == [0, -1, 1, -1]
+    assert list(rows["TAG:mobile edit"]) == [1, 0, 0, 0]
+    assert list(rows["TAG:visualeditor"]) == [1, 0, 0, 0]
+    assert list(rows["itemid"]) == [10, 12, -2, 11]
+    assert list(rows["userid"]) == [7, 99, -1, -2]
+    assert list(rows["itemid_freq"]) == [5, 0, 0, 2]
+    assert list(rows["userid_freq"]) == [3, 0, 1, 0]
+    assert list(rows["priv_user"]) == [1, 0, 0, 0]
+    assert list(rows["is_reg"]) == [1, 1, 0, 1]
+    assert list(rows["size"]) == [3.5, 0, -1, -1]
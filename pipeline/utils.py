@@ -5,6 +5,8 @@ Created on Tue Nov 29 11:48:18 2016
 @author: Rafael Crescenzi
 """
 
+import sys
+
 import numpy as np
 
 data_dtypes = {'action': str, 'afectedProperty': str, 'alphanumericRatio': np.float32, 'amount': np.float32,
@@ -16,10 +18,28 @@ data_dtypes = {'action': str, 'afectedProperty': str, 'alphanumericRatio': np.fl
                'lowerCaseWordRatio': np.float32, 'main_alphabet': str, 'minor': np.float32, 'nonLatinRatio': np.float32,
                'prev_user': str, 'punctuationRatio': np.float32, 'revisionid': int, 'simbolRatio': np.float32,
                'subaction': str, 'timestamp': str, 'upperCaseRatio': np.float32, 'upperCaseWordRatio': np.float32,
-               'userid': int, 'whitespaceRatio': np.float32}
+               'userid': int, 'whitespaceRatio': np.float32, 'value_is_item': np.float32, 'is_authority_control': np.float32}
 meta_dtypes = {'REVISION_ID': int, 'REVISION_SESSION_ID': int, 'USER_COUNTRY_CODE': str,
                'USER_CONTINENT_CODE': str, 'USER_TIME_ZONE': str, 'USER_REGION_CODE': str,
                'USER_CITY_NAME': str, 'USER_COUNTY_NAME': str, 'REVISION_TAGS': str}
+# stored as 64 bit integers by the columnar format, float32 and %.4g round them
+id_columns = ['revisionid', 'userid', 'itemid', 'REVISION_SESSION_ID']
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+    except ImportError:
+        pass
+    try:
+        import psutil
+        mem = psutil.Process().memory_info()
+        return getattr(mem, "peak_wset", mem.rss) / 2 ** 20
+    except ImportError:
+        return float("nan")
+
 
 bad_words = ["abbo", "abo",
         "abortion", "abuse", "addict", "addicts", "adult", "africa",